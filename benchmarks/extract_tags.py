@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# Compare format_chats.extract_tags (one scan, all tags) with one extract_tag call per tag.
+# Usage: python3 benchmarks/extract_tags.py [--documents 20000]
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.suite.synthetic import TAGS, make_tagged_documents
+from format_chats import extract_tag, extract_tags
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-tag extraction.")
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    documents = make_tagged_documents(args.documents, args.seed)
+    megabytes = sum(map(len, documents)) / 1e6
+
+    start = time.perf_counter()
+    per_tag = [{tag: extract_tag(doc, tag) for tag in TAGS} for doc in documents]
+    per_tag_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    one_scan = [extract_tags(doc, TAGS) for doc in documents]
+    one_scan_seconds = time.perf_counter() - start
+
+    assert all(first[tag] == (found[tag][0] if found[tag] else '') for first, found in zip(per_tag, one_scan) for tag in TAGS)
+    print(f"{args.documents} documents, {megabytes:.1f} MB, tags: {', '.join(TAGS)}")
+    print(f"extract_tag per tag: {per_tag_seconds:.3f}s ({megabytes / per_tag_seconds:.1f} MB/s)")
+    print(f"extract_tags:        {one_scan_seconds:.3f}s ({megabytes / one_scan_seconds:.1f} MB/s), "
+          f"{per_tag_seconds / one_scan_seconds:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Compare format_chats.text_to_chat_dynamic with the previous two-pass version on long dialogues.
+# Usage: python3 benchmarks/format_chats_dialogue.py [--turns 1000 10000 100000]
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.suite.synthetic import make_dialogue
+from format_chats import text_to_chat_dynamic
+
+# Previous implementation: discovers roles, rebuilds a regex and inserts turns at index 0
+def text_to_chat_dynamic_two_pass(dialogues_str):
+    pattern = re.compile(r'\b([A-Za-z0-9_]+): ')
+    roles = set()
+    for match in pattern.finditer(dialogues_str):
+        roles.add(match.group(1).lower())
+        if len(roles) == 2:
+            break
+    if len(roles) != 2:
+        raise ValueError("Exactly two unique roles must be present in the dialogue.")
+    role_pattern = re.compile(fr'\b({"|".join(roles)}): ', re.IGNORECASE)
+    roles_positions = [(match.start(), match.end(), match.group(1)) for match in role_pattern.finditer(dialogues_str)]
+    formatted_dialogues = []
+    next_start = None
+    for i in range(len(roles_positions) - 1, -1, -1):
+        start, end, role = roles_positions[i]
+        content = dialogues_str[end:].strip() if next_start is None else dialogues_str[end:next_start].strip()
+        content = re.sub(r'\n\s+', '\n', content)
+        formatted_dialogues.insert(0, {'role': role.lower(), 'content': content})
+        next_start = start
+    return formatted_dialogues
+
+def best_time(fn, arg, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text_to_chat_dynamic on long dialogues.")
+    parser.add_argument("--turns", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'turns':>8}{'two-pass s':>13}{'single-pass s':>15}{'speedup':>10}")
+    for turns in args.turns:
+        dialogue = make_dialogue(random.Random(0), turns, speakers=('User', 'Assistant'))
+        assert text_to_chat_dynamic(dialogue) == text_to_chat_dynamic_two_pass(dialogue)
+        before = best_time(text_to_chat_dynamic_two_pass, dialogue, args.repeat)
+        after = best_time(text_to_chat_dynamic, dialogue, args.repeat)
+        print(f"{turns:>8}{before:>13.3f}{after:>15.3f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
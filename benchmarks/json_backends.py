@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Compare the json_jsonl.py backends on synthetic records of varying size.
+# Usage: python3 benchmarks/json_backends.py [--records 20000]
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.suite.synthetic import make_record
+from json_jsonl import BACKENDS, get_backend
+
+# (label, number of fields, text length per field)
+RECORD_SIZES = [('small', 4, 16), ('medium', 16, 128), ('large', 64, 1024)]
+
+def time_call(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON backends used by json_jsonl.py.")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backends = []
+    for name in BACKENDS:
+        try:
+            backends.append(get_backend(name))
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+
+    reference = get_backend('json')
+    print(f"{'size':<8}{'backend':<10}{'MB':>8}{'loads MB/s':>12}{'dumps MB/s':>12}{'indent MB/s':>13}")
+    for label, fields, text_len in RECORD_SIZES:
+        rng = random.Random(args.seed)
+        count = max(1, args.records * 4 // fields)
+        records = [make_record(rng, fields, text_len) for _ in range(count)]
+        lines = [reference.dumps(record) for record in records]
+        megabytes = sum(map(len, lines)) / 1e6
+        for backend in backends:
+            loads = time_call(backend.loads, lines)
+            dumps = time_call(backend.dumps, records)
+            indent = time_call(backend.dumps_indent, records)
+            print(f"{label:<8}{backend.name:<10}{megabytes:>8.1f}"
+                  f"{megabytes / loads:>12.1f}{megabytes / dumps:>12.1f}{megabytes / indent:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# Benchmark suite: synthetic inputs (synthetic.py), timed cases (cases.py) and the
+# report/baseline runner (python3 -m benchmarks.suite --help).
@@ -0,0 +1,177 @@
+# Benchmark cases. Each case is set up from a scale and a working directory and returns
+# (run, size): `run` is the zero-argument call that gets timed, and `size` holds the
+# 'items' and 'bytes' that one call processes, from which throughput is computed.
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from . import synthetic
+
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _record_files(workdir, params, seed, label, fields, text_len, divisor):
+    # Files are shared by the cases of one record size; returns (record count, paths)
+    count = max(1, params['records'] // divisor)
+    json_path = os.path.join(workdir, f'{label}.json')
+    jsonl_path = os.path.join(workdir, f'{label}.jsonl')
+    if not os.path.exists(json_path):
+        records = synthetic.make_records(count, fields, text_len, seed)
+        synthetic.write_json(records, json_path)
+        synthetic.write_jsonl(records, jsonl_path)
+    return count, json_path, jsonl_path
+
+
+def _json_cases(label, fields, text_len, divisor):
+    from json_jsonl import (convert_json_to_jsonl_stream, convert_jsonl_to_json, convert_jsonl_to_json_stream,
+                            get_backend, validate_jsonl)
+
+    @case(f'json_jsonl.json_to_jsonl_stream.{label}')
+    def json_to_jsonl(workdir, params, seed):
+        count, json_path, _ = _record_files(workdir, params, seed, label, fields, text_len, divisor)
+        out = os.path.join(workdir, f'{label}.out.jsonl')
+        return (lambda: convert_json_to_jsonl_stream(json_path, out, get_backend('json')),
+                {'items': count, 'bytes': os.path.getsize(json_path)})
+
+    @case(f'json_jsonl.jsonl_to_json.{label}')
+    def jsonl_to_json(workdir, params, seed):
+        count, _, jsonl_path = _record_files(workdir, params, seed, label, fields, text_len, divisor)
+        out = os.path.join(workdir, f'{label}.out.json')
+        return (lambda: convert_jsonl_to_json(jsonl_path, out, get_backend('json')),
+                {'items': count, 'bytes': os.path.getsize(jsonl_path)})
+
+    @case(f'json_jsonl.jsonl_to_json_stream.{label}')
+    def jsonl_to_json_stream(workdir, params, seed):
+        count, _, jsonl_path = _record_files(workdir, params, seed, label, fields, text_len, divisor)
+        out = os.path.join(workdir, f'{label}.out.json')
+        return (lambda: convert_jsonl_to_json_stream(jsonl_path, out, get_backend('json')),
+                {'items': count, 'bytes': os.path.getsize(jsonl_path)})
+
+    @case(f'json_jsonl.validate_jsonl.{label}')
+    def validate(workdir, params, seed):
+        count, _, jsonl_path = _record_files(workdir, params, seed, label, fields, text_len, divisor)
+        return (lambda: validate_jsonl(jsonl_path, 1, get_backend('json')),
+                {'items': count, 'bytes': os.path.getsize(jsonl_path)})
+
+
+for _record_size in synthetic.RECORD_SIZES:
+    _json_cases(*_record_size)
+
+
+@case('extract_json.markdown')
+def extract_markdown(workdir, params, seed):
+    from extract_json import extract_json
+    from json_jsonl import get_backend
+
+    records = synthetic.make_records(params['records'], 8, 64, seed)
+    path = os.path.join(workdir, 'prompts.md')
+    synthetic.write_markdown(records, path, seed)
+    out = os.path.join(workdir, 'prompts.jsonl')
+    return (lambda: extract_json(path, out, 'jsonl', get_backend('json')),
+            {'items': len(records), 'bytes': os.path.getsize(path)})
+
+
+@case('format_chats.text_to_chat_dynamic')
+def text_to_chat_dynamic(workdir, params, seed):
+    from format_chats import text_to_chat_dynamic
+
+    dialogues = synthetic.make_dialogues(params['dialogues'], params['turns'], seed)
+    return (lambda: [text_to_chat_dynamic(dialogue) for dialogue in dialogues],
+            {'items': len(dialogues), 'bytes': sum(map(len, dialogues))})
+
+
+@case('format_chats.format_chat')
+def format_chat(workdir, params, seed):
+    from format_chats import format_chat
+
+    dialogues = synthetic.make_dialogues(params['dialogues'], params['turns'], seed)
+    roles = {'human': 'user', 'assistant': 'assistant'}
+    return (lambda: [format_chat(dialogue, roles) for dialogue in dialogues],
+            {'items': len(dialogues), 'bytes': sum(map(len, dialogues))})
+
+
+@case('format_chats.extract_tags')
+def extract_tags(workdir, params, seed):
+    from format_chats import extract_tags
+
+    documents = synthetic.make_tagged_documents(params['documents'], seed)
+    return (lambda: [extract_tags(document, synthetic.TAGS) for document in documents],
+            {'items': len(documents), 'bytes': sum(map(len, documents))})
+
+
+@case('format_chats.convert_corpus')
+def convert_corpus(workdir, params, seed):
+    from format_chats import convert_corpus
+
+    records = synthetic.make_sharegpt_records(params['dialogues'] * 5, params['turns'], seed)
+    path = os.path.join(workdir, 'sharegpt.jsonl')
+    synthetic.write_jsonl(records, path)
+    out = os.path.join(workdir, 'chatml.jsonl')
+    return (lambda: convert_corpus(path, out, 'sharegpt-chatml', workers=1, backend='json'),
+            {'items': len(records), 'bytes': os.path.getsize(path)})
+
+
+def _vocabulary():
+    from common_words import words_str
+    return words_str.split(',')
+
+
+@case('common_words.count_corpus')
+def count_corpus(workdir, params, seed):
+    from common_words import count_corpus
+
+    path = os.path.join(workdir, 'corpus.txt')
+    synthetic.write_corpus(path, params['corpus_mb'], _vocabulary(), seed)
+    return lambda: count_corpus([path], 1), {'items': None, 'bytes': os.path.getsize(path)}
+
+
+@case('common_words.build_freq_table')
+def build_freq_table(workdir, params, seed):
+    from collections import Counter
+    from common_words import build_freq_table
+
+    # Brown-sized vocabulary: the top words plus a long tail of rare ones
+    counts = Counter({word.lower(): 1000 // rank for rank, word in enumerate(_vocabulary(), 1)})
+    counts.update({f'rare{i}': 1 for i in range(params['records'] * 2)})
+    path = os.path.join(workdir, 'freq.bin')
+    return lambda: build_freq_table(counts, path), {'items': len(counts), 'bytes': None}
+
+
+@case('common_words.rank_words')
+def rank_words(workdir, params, seed):
+    from collections import Counter
+    from common_words import FreqTable, build_freq_table, rank_words
+
+    vocabulary = _vocabulary()
+    counts = Counter({word.lower(): 1000 // rank for rank, word in enumerate(vocabulary, 1)})
+    counts.update({f'rare{i}': 1 for i in range(params['records'] * 2)})
+    path = os.path.join(workdir, 'rank_freq.bin')
+    build_freq_table(counts, path)
+    table = FreqTable(path)
+    words = vocabulary * max(1, params['records'] // 1000)
+    return lambda: rank_words(words, table), {'items': len(words), 'bytes': None}
+
+
+def _dedup_case(method, label, mean_cosine):
+    @case(f'rm_duplicate_images.remove_duplicate_images.{method}.{label}')
+    def remove_duplicates(workdir, params, seed):
+        from rm_duplicate_images import remove_duplicate_images
+
+        names, emb = synthetic.make_embeddings(params['images'], mean_cosine=mean_cosine, seed=seed)
+        return (lambda: remove_duplicate_images(names, emb, 0.95, method=method),
+                {'items': len(names), 'bytes': emb.nbytes})
+
+
+# isotropic vectors, and vectors in a CLIP-like cone where unrelated images have cosine ~0.5
+for _method in ('exact', 'lsh'):
+    _dedup_case(_method, 'isotropic', 0.0)
+    _dedup_case(_method, 'cone', synthetic.CLIP_MEAN_COSINE)
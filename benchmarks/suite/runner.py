@@ -0,0 +1,165 @@
+# Run the benchmark suite and write a JSON report, optionally comparing it with a baseline.
+# Cases run in spawned worker processes, which import run_case from this module.
+# Usage (from the repository root):
+#   python3 -m benchmarks.suite --scale small --output report.json
+#   python3 -m benchmarks.suite --scale small --output new.json --baseline report.json
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from .synthetic import SCALES
+
+# Peak RSS growth below this is interpreter and allocator noise, not a regression
+RSS_NOISE_MB = 8
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+def reset_peak_rss():
+    # Linux: restart the high-water mark (ru_maxrss included) at the current RSS, so the
+    # peak read after the timed runs is theirs rather than the input generation's
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def run_case(name, scale, seed, repeat, workdir):
+    # Runs in a fresh process, so the peak RSS belongs to this case alone
+    from .cases import CASES
+
+    rss_before = peak_rss_mb()
+    run, size = CASES[name](workdir, SCALES[scale], seed)
+    gc.collect()
+    rss_setup = peak_rss_mb()
+    # Without a reset (macOS, Windows) the peak may still be the setup's
+    rss_start = rss_setup
+    if reset_peak_rss():
+        rss_start = peak_rss_mb()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        'seconds': best,
+        'mean_seconds': sum(times) / len(times),
+        'items': size['items'],
+        'bytes': size['bytes'],
+        'items_per_s': size['items'] / best if size['items'] else None,
+        'mb_per_s': size['bytes'] / best / 1e6 if size['bytes'] else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'input_rss_mb': None if rss_before is None else rss_setup - rss_before,
+        'run_rss_mb': None if rss_start is None else peak_rss_mb() - rss_start,
+    }
+
+
+def compare(report, baseline, tolerance):
+    # Returns [(case, baseline seconds, seconds, time ratio, baseline peak MB, peak MB, regressed)]
+    # for cases in both reports. A case regresses if it is slower by more than `tolerance`, or
+    # its peak RSS grew by more than `tolerance` and by more than RSS_NOISE_MB.
+    rows = []
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        regressed = ratio > 1 + tolerance
+        peak_before, peak = before.get('peak_rss_mb'), result.get('peak_rss_mb')
+        if peak_before is not None and peak is not None:
+            regressed |= peak > peak_before * (1 + tolerance) and peak - peak_before > RSS_NOISE_MB
+        rows.append((name, before['seconds'], result['seconds'], ratio, peak_before, peak, regressed))
+    return rows
+
+
+def main():
+    from .cases import CASES
+
+    parser = argparse.ArgumentParser(description="Benchmark the repository's Python tools on synthetic data.")
+    parser.add_argument("--scale", choices=list(SCALES), default='small')
+    parser.add_argument("--cases", nargs="+", metavar="PREFIX", help="only run cases whose name starts with a prefix")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown relative to the baseline reported as a regression (0.2 = 20%%)")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.cases or name.startswith(tuple(args.cases))]
+    if args.list:
+        print('\n'.join(names))
+        return
+    if not names:
+        parser.error("no case matches --cases")
+
+    import numpy as np
+    report = {
+        'meta': {
+            'scale': args.scale,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': {},
+    }
+
+    context = multiprocessing.get_context('spawn')
+    print(f"{'case':<64}{'seconds':>10}{'items/s':>12}{'MB/s':>9}{'peak MB':>9}")
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+        for name in names:
+            with context.Pool(1) as pool:
+                result = pool.apply(run_case, (name, args.scale, args.seed, args.repeat, workdir))
+            report['results'][name] = result
+            items = f"{result['items_per_s']:.0f}" if result['items_per_s'] else '-'
+            mb = f"{result['mb_per_s']:.1f}" if result['mb_per_s'] else '-'
+            peak = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else '-'
+            print(f"{name:<64}{result['seconds']:>10.3f}{items:>12}{mb:>9}{peak:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('scale') != args.scale:
+            print(f"Warning: baseline was run at scale '{baseline['meta'].get('scale')}', this run at '{args.scale}'")
+        rows = compare(report, baseline, args.tolerance)
+        print(f"\n{'case':<64}{'baseline s':>12}{'now s':>10}{'change':>9}{'baseline MB':>13}{'now MB':>9}")
+        for name, before, after, ratio, peak_before, peak, regressed in rows:
+            flag = '  REGRESSION' if regressed else ''
+            peak_before = f"{peak_before:.0f}" if peak_before is not None else '-'
+            peak = f"{peak:.0f}" if peak is not None else '-'
+            print(f"{name:<64}{before:>12.3f}{after:>10.3f}{ratio - 1:>+9.0%}{peak_before:>13}{peak:>9}{flag}")
+        regressions = sum(row[-1] for row in rows)
+        print(f"{len(rows)} cases compared, {regressions} slower or larger than the baseline by more than {args.tolerance:.0%}.")
+        sys.exit(1 if regressions else 0)
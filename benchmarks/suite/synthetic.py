@@ -0,0 +1,138 @@
+# Reproducible synthetic inputs for the benchmark suite: the same seed and scale always
+# produce the same bytes, so timings from different runs and machines are comparable.
+
+import json
+import random
+import string
+
+import numpy as np
+
+# Input sizes per scale; 'small' runs in seconds and is meant for quick before/after checks
+SCALES = {
+    'small': {'records': 2000, 'dialogues': 200, 'turns': 20, 'documents': 2000, 'corpus_mb': 2, 'images': 2000},
+    'medium': {'records': 20000, 'dialogues': 2000, 'turns': 20, 'documents': 20000, 'corpus_mb': 16, 'images': 10000},
+    'large': {'records': 200000, 'dialogues': 20000, 'turns': 40, 'documents': 100000, 'corpus_mb': 128, 'images': 50000},
+}
+
+# (label, text fields per record, characters per field, record count divisor); large records
+# are fewer, so both sizes cover a similar number of bytes
+RECORD_SIZES = [('small_records', 4, 16, 1), ('large_records', 32, 512, 64)]
+
+WORDS = ("the model considers each option carefully before it commits to a final result and then "
+         "explains which notes were checked again").split()
+TAGS = ('reasoning', 'answer', 'title')
+
+# CLIP ViT-B/32 embedding width
+EMBEDDING_DIM = 512
+
+
+def make_record(rng, fields, text_len):
+    record = {'id': rng.randrange(1 << 40), 'score': rng.random(), 'tags': ['a', 'b', 'c']}
+    for i in range(fields):
+        record[f'field_{i}'] = ''.join(rng.choices(string.ascii_letters + ' ', k=text_len))
+    record['nested'] = {'flag': True, 'values': [rng.random() for _ in range(8)]}
+    return record
+
+
+def make_records(count, fields, text_len, seed=0):
+    rng = random.Random(seed)
+    return [make_record(rng, fields, text_len) for _ in range(count)]
+
+
+def write_json(records, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=2)
+
+
+def write_jsonl(records, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def write_markdown(records, path, seed=0):
+    # Prompt dump: headings and prose around pretty-printed objects, some of them fenced,
+    # with a broken object every 100 records
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, record in enumerate(records):
+            f.write(f"## Prompt {i}\n{filler(rng, rng.randint(10, 60))} {{see below}}.\n\n")
+            body = json.dumps(record, indent=2)
+            f.write(f"```json\n{body}\n```\n\n" if i % 2 else f"{body}\n\n")
+            if i % 100 == 99:
+                f.write('{\n  "broken": ,\n}\n\n')
+
+
+def filler(rng, count):
+    return ' '.join(rng.choices(WORDS, k=count))
+
+
+def make_dialogue(rng, turns, speakers=('Human', 'Assistant')):
+    lines = []
+    for i in range(turns):
+        text = filler(rng, rng.randint(5, 40))
+        if rng.random() < 0.2:
+            text += '\n   ' + filler(rng, 10)
+        lines.append(f"{speakers[i % 2]}: {text}")
+    return '\n'.join(lines)
+
+
+def make_dialogues(count, turns, seed=0):
+    rng = random.Random(seed)
+    return [make_dialogue(rng, turns) for _ in range(count)]
+
+
+def make_sharegpt_records(count, turns, seed=0):
+    rng = random.Random(seed)
+    return [
+        {'conversations': [
+            {'from': 'human' if i % 2 == 0 else 'gpt', 'value': filler(rng, rng.randint(5, 80))}
+            for i in range(turns)
+        ]}
+        for _ in range(count)
+    ]
+
+
+def make_tagged_document(rng):
+    # LLM-style response with one block per tag buried in untagged text
+    return (f"{filler(rng, rng.randint(50, 400))}\n<reasoning>{filler(rng, rng.randint(50, 300))}</reasoning>\n"
+            f"{filler(rng, rng.randint(10, 100))}\n<answer>{filler(rng, rng.randint(5, 50))}</answer>\n"
+            f"<title>{filler(rng, 5)}</title>")
+
+
+def make_tagged_documents(count, seed=0):
+    rng = random.Random(seed)
+    return [make_tagged_document(rng) for _ in range(count)]
+
+
+def write_corpus(path, megabytes, vocabulary, seed=0):
+    # Plain text whose word frequencies follow Zipf's law over `vocabulary`
+    rng = random.Random(seed)
+    cum_weights = np.cumsum(1.0 / np.arange(1, len(vocabulary) + 1)).tolist()
+    with open(path, 'w', encoding='utf-8') as f:
+        while f.tell() < megabytes << 20:
+            words = rng.choices(vocabulary, cum_weights=cum_weights, k=20000)
+            f.write('\n'.join(' '.join(words[i:i + 16]) for i in range(0, len(words), 16)))
+            f.write('\n')
+
+
+# Mean cosine between unrelated CLIP image embeddings: they share a common direction
+CLIP_MEAN_COSINE = 0.5
+
+
+def make_embeddings(count, dim=EMBEDDING_DIM, duplicate_fraction=0.1, noise=0.05, mean_cosine=0.0, seed=0):
+    # Unit vectors standing in for CLIP image embeddings; `duplicate_fraction` of the rows are
+    # noisy copies of other rows (cosine around 0.99), like resized or re-encoded images.
+    # mean_cosine > 0 adds a shared offset so unrelated rows have about that cosine, as in
+    # real CLIP outputs; 0 gives isotropic vectors.
+    rng = np.random.default_rng(seed)
+    emb = rng.standard_normal((count, dim), dtype=np.float32) / np.float32(np.sqrt(dim))
+    if mean_cosine:
+        offset = rng.standard_normal(dim).astype(np.float32)
+        emb += np.sqrt(mean_cosine / (1 - mean_cosine)) * offset / np.linalg.norm(offset)
+    copies = rng.choice(count, size=int(count * duplicate_fraction), replace=False)
+    sources = rng.integers(0, count, size=len(copies))
+    emb[copies] = emb[sources] + noise / np.sqrt(dim) * rng.standard_normal((len(copies), dim), dtype=np.float32)
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    names = [f'img_{i:07d}.jpg' for i in range(count)]
+    return names, emb
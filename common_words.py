@@ -1,28 +1,170 @@
+import argparse
+import mmap
+import re
+import struct
+from bisect import bisect_left
+from collections import Counter
+from multiprocessing import Pool
+from pathlib import Path
 
-import nltk
-from nltk.corpus import brown
-from nltk import FreqDist
+# Compact frequency table: header, uint64 offsets into a blob of UTF-8 words sorted
+# bytewise, uint32 counts, then the blob; lookups are a binary search over the mmap
+TABLE_PATH = Path(__file__).with_name("brown_freq.bin")
+TABLE_MAGIC = b"WFREQ1\0\0"
+TABLE_HEADER = struct.Struct("<8sQ")
 
-# Download the Brown corpus (if not already downloaded)
-nltk.download("brown", quiet=True)
-# Get the Brown corpus words and compute a case‐insensitive frequency distribution
-freq = FreqDist(w.lower() for w in brown.words())
+# Corpus counting: files are split into whitespace-aligned byte ranges of this size, and
+# each range is tokenized in blocks of COUNT_BLOCK_SIZE so a worker holds one block at a time
+CORPUS_CHUNK_SIZE = 64 << 20
+COUNT_BLOCK_SIZE = 1 << 20
+TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)*")
 
 # Provided list of top 1k English words (already computed)
 words_str = """the,of,and,to,in,that,he,for,it,with,as,his,on,be,at,by,I,this,not,but,from,or,have,they,which,one,you,her,all,she,there,would,their,we,him,when,who,will,more,if,no,out,so,what,up,its,about,into,than,them,can,only,other,new,some,could,time,these,two,may,then,do,first,any,my,now,such,like,our,over,man,me,even,most,after,also,many,before,must,through,back,much,where,your,way,well,down,should,because,each,just,those,people,how,too,little,state,good,very,make,world,still,own,see,work,long,here,get,between,both,life,under,never,day,same,another,know,while,last,us,might,great,old,year,off,come,since,against,go,right,take,three,himself,few,house,use,during,without,again,place,American,around,however,home,small,thought,say,part,once,general,high,upon,school,every,left,number,course,war,until,always,away,something,fact,water,though,public,less,put,think,almost,hand,enough,far,head,yet,government,system,better,set,night,nothing,end,why,find,look,later,point,next,program,business,city,group,give,toward,young,let,room,president,side,social,present,several,order,national,possible,rather,second,face,per,among,form,important,often,early,white,case,large,big,four,need,become,within,along,best,church,ever,least,power,development,light,thing,family,interest,want,mind,area,country,others,although,open,service,certain,kind,problem,different,door,thus,help,sense,whole,matter,perhaps,itself,human,law,line,above,name,example,action,company,local,show,five,history,whether,either,today,act,across,past,quite,anything,death,body,experience,half,really,week,car,field,word,already,themselves,information,tell,college,together,money,period,keep,sure,probably,free,behind,political,real,air,question,office,miss,whose,special,major,ago,federal,moment,study,available,result,street,economic,boy,position,reason,change,south,board,individual,job,society,west,close,turn,community,love,true,court,force,full,cost,seem,wife,age,future,voice,center,woman,common,control,necessary,policy,front,sometimes,girl,six,clear,land,able,feel,mother,music,party,provide,education,child,effect,level,military,run,short,town,morning,total,outside,figure,rate,art,century,class,north,usually,leave,plan,evidence,million,sound,top,black,hard,strong,tax,various,believe,play,surface,type,value,mean,soon,modern,near,peace,table,book,red,road,personal,process,situation,alone,idea,increase,nor,cut,finally,nature,private,third,section,call,fire,ground,view,dark,everything,pressure,space,east,father,return,support,attention,late,particular,recent,hope,live,else,beyond,stage,dead,inside,material,person,read,report,data,heart,instead,low,amount,feeling,pay,single,cold,hundred,including,industry,move,research,simply,hold,defense,actually,central,religious,son,sort,ten,rest,care,especially,indeed,medical,picture,administration,difficult,fine,subject,building,simple,wall,meeting,bring,floor,foreign,paper,range,similar,final,natural,property,training,growth,international,market,police,start,talk,hear,story,suddenly,Congress,answer,issue,likely,entire,meet,purpose,difference,hair,production,stand,fall,food,stock,particularly,whom,effort,hour,knowledge,letter,yes,bill,blue,certainly,deal,ready,trade,bad,method,nearly,statement,throughout,according,anyone,color,try,lay,nation,physical,remember,size,member,record,southern,understand,western,population,direction,summer,trial,trouble,evening,friend,list,maybe,chance,former,husband,science,step,student,cause,hot,month,series,lead,myself,piece,theory,wrong,ask,clearly,movement,organization,beautiful,bed,consider,fear,lot,note,spring,treatment,hotel,truth,degree,herself,plant,wide,easy,approach,game,recently,charge,couple,eye,oh,performance,blood,opportunity,radio,stop,decision,image,main,test,window,character,gun,middle,responsibility,account,appear,activity,green,serious,audience,forward,specific,design,hit,quality,born,choice,include,operation,pattern,poor,seven,shot,staff,stay,whatever,ball,heavy,hospital,speak,standard,wish,ahead,deep,democratic,firm,language,visit,analysis,expect,none,price,continue,determine,pretty,serve,agreement,scene,write,attack,drive,health,professional,reach,season,station,current,despite,eight,role,exactly,machine,mouth,race,unit,news,rise,bit,director,officer,doctor,energy,walk,gas,glass,claim,concern,fight,happy,popular,share,style,follow,heat,thousand,behavior,conference,film,marriage,oil,sea,successful,arm,discussion,everyone,practice,sign,someone,source,wait,authority,project,remain,success,base,civil,condition,dinner,management,measure,security,structure,weight,kitchen,develop,pass,quickly,add,break,carry,check,cover,key,manager,pain,relationship,product,build,financial,loss,patient,require,significant,capital,begin,collection,learn,sex,bank,prevent,team,bar,interesting,produce,campaign,event,trip,watch,indicate,offer,teacher,economy,reality,term,edge,enter,fast,mission,traditional,address,election,model,response,memory,nice,receive,region,dog,official,rock,vote,ability,leader,positive,rich,send,store,brother,die,rule,writer,accept,allow,daughter,detail,everybody,legal,factor,box,buy,foot,song,politics,realize,seek,animal,article,beat,career,impact,sit,wonder,yourself,chair,page,score,attorney,cell,join,newspaper,dream,explain,message,site,assume,benefit,grow,happen,kill,wind,baby,billion,fund,recognize,reduce,save,commercial,eat,imagine,kid,shoulder,speech,travel,garden,goal,maintain,onto,task,budget,drop,exist,lie,notice,painting,sexual,tree,avoid,culture,establish,leg,lose,remove,safe,smile,somebody,artist,majority,professor,agency,apply,draw,guess,cultural,executive,generation,huge,item,minute,pick,win,worry,Republican,create,forget,phone,risk,seat,suggest,disease,prove,spend,raise,agree,guy,listen,player,pull,choose,fill,mention,television,skin,author,decade,violence,contain,cup,agent,enjoy,catch,environment,investment,lawyer,occur,technology,tend,bag,skill,threat,throw,weapon,describe,institution,sell,teach,decide,discover,finger,focus,TV,finish,improve,magazine,soldier,consumer,represent,sister,tonight,admit,fail,push,camera,challenge,thank,tough,affect,crime,fish,prepare,wear,yard,candidate,protect,senior,sing,fly,interview,owner,suffer,debate,partner,stuff,involve,citizen,expert,network,reveal,worker,argue,movie,perform,compare,discuss,laugh,customer,shoot,victim,card,hang,identify,treat,adult,cancer,reflect,star,yeah,arrive,coach,drug,employee,strategy,respond,manage,scientist,shake,sport,parent,Democrat,computer,media,resource,environmental,relate,ok,option,participant,PM,Mrs,Mr,n't"""
 
-# Create the list from the string (removing any extra whitespace)
-words_list = [word.strip() for word in words_str.splitlines() if word.strip()]
+def brown_words():
+    # NLTK is only needed to (re)build the table
+    import nltk
+    from nltk.corpus import brown
 
-# Sort the words based on frequency (most common first)
-# For words not found in the corpus, frequency defaults to 0.
-sorted_words = sorted(words_list, key=lambda w: (-freq[w.lower()], w))
+    # Download the Brown corpus (if not already downloaded)
+    nltk.download("brown", quiet=True)
+    return brown.words()
 
-# Join the sorted list into one comma-separated line
-output_line = ",".join(sorted_words)
+def build_freq_table(words, table_path=TABLE_PATH):
+    # Case-insensitive frequency distribution written as a sorted, memory-mappable table;
+    # `words` is a token stream or an already lowercased Counter
+    counts = words if isinstance(words, Counter) else Counter(w.lower() for w in words)
+    keys = sorted(w.encode("utf-8") for w in counts)
+    offsets = [0]
+    for key in keys:
+        offsets.append(offsets[-1] + len(key))
+    with open(table_path, "wb") as f:
+        f.write(TABLE_HEADER.pack(TABLE_MAGIC, len(keys)))
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        f.write(struct.pack(f"<{len(keys)}I", *(counts[key.decode("utf-8")] for key in keys)))
+        f.write(b"".join(keys))
+    return len(keys)
 
-# Output the result (one very long line)
-print(output_line)
+class FreqTable:
+    def __init__(self, table_path=TABLE_PATH):
+        with open(table_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size = TABLE_HEADER.unpack_from(self._mm)
+        if magic != TABLE_MAGIC:
+            raise ValueError(f"{table_path} is not a word frequency table")
+        counts_start = TABLE_HEADER.size + 8 * (self.size + 1)
+        self._offsets = memoryview(self._mm)[TABLE_HEADER.size:counts_start].cast("Q")
+        self._counts = memoryview(self._mm)[counts_start:counts_start + 4 * self.size].cast("I")
+        self._blob = counts_start + 4 * self.size
+
+    def key(self, i):
+        return self._mm[self._blob + self._offsets[i]:self._blob + self._offsets[i + 1]]
+
+    def __getitem__(self, word):
+        # Same contract as FreqDist: unknown words count 0
+        target = word.encode("utf-8")
+        i = bisect_left(range(self.size), target, key=self.key)
+        return self._counts[i] if i < self.size and self.key(i) == target else 0
+
+def load_freq_table(table_path=TABLE_PATH, rebuild=False):
+    if rebuild or not Path(table_path).exists():
+        build_freq_table(brown_words(), table_path)
+    return FreqTable(table_path)
+
+def corpus_ranges(path, chunk_size=CORPUS_CHUNK_SIZE):
+    # Split a file into byte ranges that end on whitespace, so no token is cut in two
+    size = Path(path).stat().st_size
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            f.seek(end)
+            while end < size:
+                block = f.read(1 << 16)
+                space = re.search(rb"\s", block)
+                if space:
+                    end += space.end()
+                    break
+                end += len(block)
+            ranges.append((str(path), start, end))
+            start = end
+    return ranges
+
+def count_range(task, block_size=COUNT_BLOCK_SIZE):
+    # Tokens are counted block by block; the trailing partial token of each block is
+    # carried into the next, so the list of tokens alive at once is one block's worth
+    path, start, end = task
+    counts = Counter()
+    carry = b""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = f.read(min(block_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            block = carry + data
+            carry = b""
+            if remaining > 0 and not block[-1:].isspace():
+                carry = block.rsplit(None, 1)[-1]
+                block = block[:len(block) - len(carry)]
+            counts.update(TOKEN_PATTERN.findall(block.decode("utf-8", errors="ignore").lower()))
+    if carry:
+        counts.update(TOKEN_PATTERN.findall(carry.decode("utf-8", errors="ignore").lower()))
+    return counts
+
+def count_corpus(paths, workers=1, chunk_size=CORPUS_CHUNK_SIZE):
+    # Map: count tokens per byte range in a process pool. Reduce: merge into one Counter,
+    # so memory follows the vocabulary rather than the corpus size.
+    tasks = [task for path in paths for task in corpus_ranges(path, chunk_size)]
+    freq = Counter()
+    if workers > 1:
+        with Pool(workers) as pool:
+            for counts in pool.imap_unordered(count_range, tasks):
+                freq.update(counts)
+    else:
+        for task in tasks:
+            freq.update(count_range(task))
+    return freq
+
+def rank_words(words_list, freq):
+    # Sort the words based on frequency (most common first)
+    # For words not found in the corpus, frequency defaults to 0.
+    return sorted(words_list, key=lambda w: (-freq[w.lower()], w))
+
+def main():
+    parser = argparse.ArgumentParser(description="Sort words by their frequency in the Brown corpus or your own text files.")
+    parser.add_argument("--build", action="store_true",
+                        help="rebuild the frequency table (from --corpus if given, else NLTK's Brown corpus)")
+    parser.add_argument("--table", type=Path, default=TABLE_PATH)
+    parser.add_argument("--words", type=Path, help="file of comma-separated words to rank instead of the built-in list")
+    parser.add_argument("--corpus", type=Path, nargs="+", help="plain-text files to count words in instead of Brown")
+    parser.add_argument("--workers", type=int, default=1, help="processes counting --corpus chunks")
+    args = parser.parse_args()
+
+    if args.corpus:
+        freq = count_corpus(args.corpus, args.workers)
+        if args.build:
+            build_freq_table(freq, args.table)
+    else:
+        freq = load_freq_table(args.table, rebuild=args.build)
+    text = args.words.read_text() if args.words else words_str
+
+    # Create the list from the string (comma or newline separated, removing any extra whitespace)
+    words_list = [word.strip() for word in re.split(r"[,\n]", text) if word.strip()]
+
+    # Join the sorted list into one comma-separated line
+    output_line = ",".join(rank_words(words_list, freq))
+
+    # Output the result (one very long line)
+    print(output_line)
+
+if __name__ == "__main__":
+    main()
 
 # Example usage:
-# Run the script with: python sort_words.py
+# Run the script with: python common_words.py
+# Rebuild the table after changing the corpus: python common_words.py --build
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from json_jsonl import (BACKENDS, cut_by_buffer_end, data_suffix, get_backend, open_output, open_text_input,
+                        write_json_array)
+
+# Text read per step. Kept small because JSONDecodeError counts the lines before the error,
+# so every malformed candidate costs time proportional to the buffer in front of it.
+CHUNK_SIZE = 64 << 10
+# A candidate that still fails to parse after buffering this much text is counted as malformed
+MAX_OBJECT_SIZE = 64 << 20
+
+# Yield every JSON object that starts with '{' at the beginning of a line (the `sed -n '/^{/,/^}/p'`
+# rule), whether in prose or inside a fenced code block, in one pass over chunked text input.
+# Candidates that do not parse are skipped and counted in stats['malformed'].
+# With a faster backend than json, a candidate is first decoded whole up to the next line
+# that starts with '}' (the end of a pretty-printed top-level object); if that text is not
+# exactly one object, the json scanner finds its extent as usual.
+def iter_markdown_objects(input_file, stats=None, chunk_size=CHUNK_SIZE, max_object_size=MAX_OBJECT_SIZE,
+                          backend=None):
+    decoder = json.JSONDecoder()
+    fast = backend if backend is not None and backend.name != 'json' else None
+    stats = stats if stats is not None else {}
+    stats.setdefault('objects', 0)
+    stats.setdefault('malformed', 0)
+    buf = '\n'  # so that an object on the very first line is found too
+    pos = 0
+    close = -1  # position of the next '\n}' at or after pos, len(buf) if there is none
+    eof = False
+
+    def fill(keep_from, min_size):
+        nonlocal buf, pos, close, eof
+        chunk = input_file.read(max(chunk_size, min_size))
+        if not chunk:
+            eof = True
+        buf = buf[keep_from:] + chunk
+        pos = 0
+        close = -1
+
+    while True:
+        start = buf.find('\n{', pos)
+        if start == -1:
+            if eof:
+                return
+            fill(len(buf) - 1, 0)  # keep the last character: it may be the '\n' of the next match
+            continue
+        if fast is not None:
+            if close < start:
+                close = buf.find('\n}', start)
+                close = len(buf) if close == -1 else close
+            if close < len(buf):
+                try:
+                    item = fast.loads(buf[start + 1:close + 2])
+                except fast.decode_error:
+                    pass
+                else:
+                    stats['objects'] += 1
+                    pos = close + 2
+                    yield item
+                    continue
+        try:
+            item, end = decoder.raw_decode(buf, start + 1)
+        except json.JSONDecodeError as e:
+            if cut_by_buffer_end(e, buf) and not eof and len(buf) - start < max_object_size:
+                # Object spans the buffer end; grow geometrically to keep parsing linear
+                fill(start, len(buf) - start)
+                continue
+            stats['malformed'] += 1
+            pos = start + 1
+            continue
+        stats['objects'] += 1
+        pos = end
+        yield item
+
+def extract_json(input_path, output_path, output_format=None, backend=None):
+    # Stream the objects of a markdown file to JSONL or, for a '.json' output, a JSON array
+    backend = backend or get_backend()
+    output_format = output_format or ('json' if data_suffix(output_path) == '.json' else 'jsonl')
+    stats = {}
+    with open_text_input(input_path) as input_file:
+        items = iter_markdown_objects(input_file, stats, backend=backend)
+        if output_path == '-':
+            write_items(items, sys.stdout.buffer, output_format, backend)
+        else:
+            with open_output(output_path) as output_file:
+                write_items(items, output_file, output_format, backend)
+    return stats
+
+def write_items(items, output_file, output_format, backend):
+    if output_format == 'json':
+        write_json_array(items, output_file, backend)
+        return
+    for item in items:
+        output_file.write(backend.dumps(item))
+        output_file.write(b'\n')
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the JSON objects embedded in a markdown file.")
+    parser.add_argument("input_file", type=Path)
+    parser.add_argument("output_file", nargs="?", default='-',
+                        help="'.json' writes a JSON array, anything else JSONL; '-' (default) writes JSONL to stdout")
+    parser.add_argument("--format", choices=['jsonl', 'json'], help="override the format chosen from output_file")
+    parser.add_argument("--backend", choices=['auto', *BACKENDS], default='json',
+                        help="JSON library used to decode and write records, see json_jsonl.py --help")
+    args = parser.parse_args()
+
+    try:
+        backend = get_backend(args.backend)
+    except ImportError:
+        parser.error(f"JSON backend '{args.backend}' is not installed")
+    output_format = args.format or ('jsonl' if args.output_file == '-' else None)
+
+    stats = extract_json(args.input_file, args.output_file, output_format, backend)
+    print(f"Extracted {stats['objects']} objects, skipped {stats['malformed']} malformed.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
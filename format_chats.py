@@ -1,5 +1,22 @@
+import argparse
+import json
 import re
-from typing import List, Dict
+import sys
+import time
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Callable, Iterator, List, Dict, Sequence
+
+from json_jsonl import get_backend, open_input, open_output, ordered_map
+
+ROLE_PATTERN = re.compile(r'^([^\n:]+)(?=\s*:)', re.MULTILINE)
+SPEAKER_PATTERN = re.compile(r'\b([A-Za-z0-9_]+): ')
+INDENT_PATTERN = re.compile(r'\n\s+')
+# Distinct speaker labels remembered per roles mapping
+ROLE_CACHE_SIZE = 4096
+# Records per worker task in the bulk converter, and tasks in flight per worker
+CONVERT_BATCH_SIZE = 1000
+BATCHES_PER_WORKER = 2
 
 
 # To ensure our code works with all chat formats and completion types, we use a similarity function to correctly identify different roles formatting.
@@ -21,26 +38,28 @@ def similarity_score(str1: str, str2: str) -> float:
     
     return len(intersection) / len(union) if union else 0.0
 
+# Map a speaker label to its closest target role; scores are computed once per distinct label
+@lru_cache(maxsize=64)
+def role_resolver(roles: tuple) -> Callable[[str], str]:
+    @lru_cache(maxsize=ROLE_CACHE_SIZE)
+    def resolve(normalized: str) -> str:
+        return max(roles, key=lambda x: similarity_score(x[0], normalized))[1]
+    return resolve
+
 # Convert text to chat format
 def format_chat(dialogues: str, roles: Dict[str, str] = {'human': 'user'}) -> List[Dict[str, str]]:
-    pattern = re.compile(r'^([^\n:]+)(?=\s*:)', re.MULTILINE)
-    matches = list(pattern.finditer(dialogues))
-    
-    roles_positions = [(match.start(), match.end(), match.group(1)) for match in matches]
+    resolve = role_resolver(tuple(roles.items()))
+    matches = list(ROLE_PATTERN.finditer(dialogues))
     
     formatted = []
-    next_start = None
     
-    for start, end, role in reversed(roles_positions):
-        normalized = role.lower().strip()
+    for i, match in enumerate(matches):
+        best_match = resolve(match.group(1).lower().strip())
         
-        best_match = max(roles.items(), key=lambda x: similarity_score(x[0], normalized))[1]
+        content_end = matches[i + 1].start() if i + 1 < len(matches) else len(dialogues)
+        content = dialogues[match.end() + 1:content_end].strip().replace(r'^[\d. ]+', '', 1)
         
-        content_start = len(dialogues) if next_start is None else next_start
-        content = dialogues[end + 1:content_start].strip().replace(r'^[\d. ]+', '', 1)
-        
-        formatted.insert(0, {'role': best_match, 'content': content})
-        next_start = start
+        formatted.append({'role': best_match, 'content': content})
     
     return formatted
 
@@ -55,6 +74,23 @@ def extract_tag(text: str, tag: str) -> str:
     return match.group(1).strip() if match else ''
 
 
+# One compiled alternation of opening tags per tag set, e.g. <(answer|title)>
+@lru_cache(maxsize=256)
+def tags_pattern(tags: tuple) -> re.Pattern:
+    return re.compile(f"<({'|'.join(re.escape(tag) for tag in tags)})>")
+
+# Extract every occurrence of several tags in one scan: a single regex pass finds the
+# opening tags and str.find locates each closing tag, so tags nested in a match are found too
+def extract_tags(text: str, tags: Sequence[str]) -> Dict[str, List[str]]:
+    found = {tag: [] for tag in tags}
+    for match in tags_pattern(tuple(tags)).finditer(text):
+        tag = match.group(1)
+        close = text.find(f'</{tag}>', match.end())
+        if close != -1:
+            found[tag].append(text[match.end():close].strip())
+    return found
+
+
 shareGPT_into_chatml = lambda chatmls: [{"role": message["from"], "content": message["value"]} for message in chatmls]
 
 chatml_into_shareGPT = lambda shareGPTs: [{"from": message["role"], "value": message["content"]} for message in shareGPTs]
@@ -63,43 +99,120 @@ group_into_dicts = lambda conversations: [{"messages": conversation} for convers
 
 
 def text_to_chat_dynamic(dialogues_str):
-    # Identifies two unique roles, adjusts parsing
-    pattern = re.compile(r'\b([A-Za-z0-9_]+): ')
-    matches = pattern.finditer(dialogues_str)
+    # Single scan: the first two distinct speakers become the roles, and every later
+    # occurrence of either one (any case) starts a new turn
     roles = set()
-    for match in matches:
+    turns = []
+    for match in SPEAKER_PATTERN.finditer(dialogues_str):
         role = match.group(1).lower()
-        roles.add(role)
-        if len(roles) == 2:
-            break
+        if role not in roles:
+            if len(roles) == 2:
+                continue
+            roles.add(role)
+        turns.append((match.start(), match.end(), role))
     if len(roles) != 2:
         raise ValueError("Exactly two unique roles must be present in the dialogue.")
-    # Create a pattern to match only the identified roles
-    role_pattern = re.compile(fr'\b({"|".join(roles)}): ', re.IGNORECASE)
-    matches = role_pattern.finditer(dialogues_str)
-    roles_positions = [(match.start(), match.end(), match.group(1)) for match in matches]
     formatted_dialogues = []
-    next_start = None
-    for i in range(len(roles_positions)-1, -1, -1):
-        start, end, role = roles_positions[i]
-        if next_start is None:
-            content = dialogues_str[end:].strip()
-        else:
-            content = dialogues_str[end:next_start].strip()
-        content = re.sub(r'\n\s+', '\n', content)
-        formatted_dialogues.insert(0, {'role': role.lower(), 'content': content})
-        next_start = start
+    for i, (start, end, role) in enumerate(turns):
+        next_start = turns[i + 1][0] if i + 1 < len(turns) else len(dialogues_str)
+        content = INDENT_PATTERN.sub('\n', dialogues_str[end:next_start].strip())
+        formatted_dialogues.append({'role': role, 'content': content})
     return formatted_dialogues
 
 
+# Bulk corpus conversion: one JSONL record in, one JSONL record out.
+# Records may be a bare message list or a dict holding it under the format's key.
+def _messages(record, key: str) -> list:
+    return record[key] if isinstance(record, dict) else record
+
+def _sharegpt_to_chatml(record, options):
+    return group_into_dicts([shareGPT_into_chatml(_messages(record, 'conversations'))])[0]
+
+def _chatml_to_sharegpt(record, options):
+    return {'conversations': chatml_into_shareGPT(_messages(record, 'messages'))}
+
+def _chatml_to_text(record, options):
+    return {'text': format_text(_messages(record, 'messages'))}
+
+def _sharegpt_to_text(record, options):
+    return {'text': format_text(shareGPT_into_chatml(_messages(record, 'conversations')))}
 
+def _text_to_chatml(record, options):
+    return {'messages': format_chat(record['text'], options['roles'])}
 
-# 1. For compatibility with all form of chat and completions format, we need to use similarity function to match the roles
-similarity = similarity_score("hello", "hallo")
-print(f"Similarity score: {similarity}")
+def _text_to_sharegpt(record, options):
+    return {'conversations': chatml_into_shareGPT(format_chat(record['text'], options['roles']))}
 
-# 2. Format Dialogues as Chat
-dialogues = """
+def _extract_tags(record, options):
+    text = record[options['field']] if isinstance(record, dict) else record
+    extracted = extract_tags(text, options['tags'])
+    return {**record, 'extracted': extracted} if isinstance(record, dict) else {'extracted': extracted}
+
+CONVERSIONS = {
+    'sharegpt-chatml': _sharegpt_to_chatml,
+    'chatml-sharegpt': _chatml_to_sharegpt,
+    'chatml-text': _chatml_to_text,
+    'sharegpt-text': _sharegpt_to_text,
+    'text-chatml': _text_to_chatml,
+    'text-sharegpt': _text_to_sharegpt,
+    'extract-tags': _extract_tags,
+}
+
+def _convert_batch(task) -> bytes:
+    lines, conversion, options, backend_name = task
+    backend = get_backend(backend_name)
+    convert = CONVERSIONS[conversion]
+    return b''.join(backend.dumps(convert(backend.loads(line), options)) + b'\n' for line in lines)
+
+def _iter_batches(input_file, batch_size: int) -> Iterator[list]:
+    batch = []
+    for line in input_file:
+        if line.strip():
+            batch.append(line)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def convert_corpus(input_path, output_path, conversion: str, roles: Dict[str, str] = {'human': 'user'},
+                   workers: int = 1, batch_size: int = CONVERT_BATCH_SIZE, backend: str = 'json',
+                   tags: Sequence[str] = ('answer',), field: str = 'response') -> int:
+    backend = get_backend(backend).name
+    options = {'roles': roles, 'tags': tuple(tags), 'field': field}
+    start = last_report = time.perf_counter()
+    records = 0
+    with open_input(input_path) as input_file, open_output(output_path) as output_file:
+        tasks = ((batch, conversion, options, backend) for batch in _iter_batches(input_file, batch_size))
+        if workers > 1:
+            pool = Pool(workers)
+            results = ordered_map(pool, _convert_batch, tasks, workers * BATCHES_PER_WORKER)
+        else:
+            pool = None
+            results = map(_convert_batch, tasks)
+        try:
+            for chunk in results:
+                output_file.write(chunk)
+                records += chunk.count(b'\n')
+                if time.perf_counter() - last_report >= 1:
+                    last_report = time.perf_counter()
+                    print(f"{records} records, {records / (last_report - start):.0f} records/s", end='\r', file=sys.stderr)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    elapsed = time.perf_counter() - start
+    print(f"Converted {records} records in {elapsed:.1f}s ({records / max(elapsed, 1e-9):.0f} records/s)", file=sys.stderr)
+    return records
+
+
+def demo():
+    # 1. For compatibility with all form of chat and completions format, we need to use similarity function to match the roles
+    similarity = similarity_score("hello", "hallo")
+    print(f"Similarity score: {similarity}")
+
+    # 2. Format Dialogues as Chat
+    dialogues = """
 Bot: My name is Bot, but you can call me bot.
 User: I'm User, I was human or Human for this matter.
 Assistant: How may I assist you today?
@@ -111,17 +224,46 @@ human: hello
 Agent.Smith: I am the AGI agent, like the AGI agent from the movie "The Matrix".
 user: no away
 """
-formatted_dialogues = format_chat(dialogues, roles={'ai': 'Assistant', 'AI_agent': 'Assistant', 'bot': 'Assistant', 'human': 'User'})
-print(formatted_dialogues)
+    formatted_dialogues = format_chat(dialogues, roles={'ai': 'Assistant', 'AI_agent': 'Assistant', 'bot': 'Assistant', 'human': 'User'})
+    print(formatted_dialogues)
+
+    # 3. Format Dialogues as Text
+    dialogues_text = format_text(formatted_dialogues)
+    # print(dialogues_text)
+
+    dialogues_text = format_chat(dialogues_text, roles={'user': 'User', 'system': 'System', 'assistant': 'Chatbot', 'human': 'User'})
+    print(dialogues_text)
+
+    # 4. Extract Tag Function Example
+    html_content = "<title>Example Page</title>"
+    extracted_title = extract_tag(html_content, "title")
+    print(f"Extracted title: {extracted_title}")
+
 
-# 3. Format Dialogues as Text
-dialogues_text = format_text(formatted_dialogues)
-# print(dialogues_text)
+def main():
+    parser = argparse.ArgumentParser(description="Stream a JSONL chat corpus (optionally .gz/.bz2/.xz) from one format to another.")
+    parser.add_argument("input_file", nargs="?")
+    parser.add_argument("output_file", nargs="?")
+    parser.add_argument("--conversion", choices=list(CONVERSIONS))
+    parser.add_argument("--roles", type=json.loads, default={'human': 'user'},
+                        help='speaker mapping for text input, e.g. \'{"human": "user", "ai": "assistant"}\'')
+    parser.add_argument("--tags", nargs="+", default=['answer'],
+                        help="tags pulled out by --conversion extract-tags")
+    parser.add_argument("--field", default='response',
+                        help="record field holding the model output for extract-tags")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=CONVERT_BATCH_SIZE)
+    parser.add_argument("--backend", default='json', help="JSON backend, see json_jsonl.py --help")
+    parser.add_argument("--demo", action="store_true", help="run the examples instead of converting")
+    args = parser.parse_args()
 
-dialogues_text = format_chat(dialogues_text, roles={'user': 'User', 'system': 'System', 'assistant': 'Chatbot', 'human': 'User'})
-print(dialogues_text)
+    if args.demo:
+        demo()
+        return
+    if not (args.input_file and args.output_file and args.conversion):
+        parser.error("input_file, output_file and --conversion are required")
+    convert_corpus(args.input_file, args.output_file, args.conversion, args.roles,
+                   args.workers, args.batch_size, args.backend, args.tags, args.field)
 
-# 4. Extract Tag Function Example
-html_content = "<title>Example Page</title>"
-extracted_title = extract_tag(html_content, "title")
-print(f"Extracted title: {extracted_title}")
+if __name__ == "__main__":
+    main()
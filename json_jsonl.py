@@ -1,45 +1,531 @@
 #!/usr/bin/env python3
 
+import argparse
+import bz2
+import gzip
+import io
 import json
+import lzma
+import mmap
+import os
+import random
+import struct
 import sys
+from collections import deque, namedtuple
+from functools import partial
+from multiprocessing import Pool
 from pathlib import Path
 
+CHUNK_SIZE = 1 << 20
+SHARD_SIZE = 64 << 20
+# Converted shards held per worker while the writer catches up; bounds parent memory
+SHARDS_IN_FLIGHT = 2
+INDEX_MAGIC = b'JSONLIX1'
+# magic, source file size, source mtime (ns), record count; followed by uint64 offsets
+INDEX_HEADER = struct.Struct('<8sQQQ')
+INDEX_OFFSET = struct.Struct('<Q')
+WHITESPACE = ' \t\n\r'
+ARRAY_DELIMITERS = WHITESPACE + ',]'
+# A parse error this close to the end of the buffer may just be a record cut by the chunk boundary
+TAIL_SIZE = 16
+UTF8_BOM = b'\xef\xbb\xbf'
+
+# Compressed streams are recognised by magic bytes on input and by suffix on output
+COMPRESSION_MAGIC = [(b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz')]
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+COMPRESSION_OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+# JSON backends work on bytes: loads(bytes) -> obj, dumps(obj) -> bytes.
+# orjson and msgspec write compact separators and raw UTF-8, so their output
+# parses to the same records but is not byte-identical to the stdlib layout.
+# They are opt-in: orjson silently turns integers wider than 64 bits into floats
+# and rejects NaN/Infinity and out-of-range numbers such as 1e400 that json accepts.
+Backend = namedtuple('Backend', ['name', 'loads', 'dumps', 'dumps_indent', 'decode_error'])
+
+def _json_backend():
+    return Backend(
+        'json',
+        json.loads,
+        lambda obj: json.dumps(obj).encode(),
+        lambda obj: json.dumps(obj, indent=2).encode(),
+        ValueError,
+    )
+
+def _orjson_backend():
+    import orjson
+    return Backend(
+        'orjson',
+        orjson.loads,
+        orjson.dumps,
+        partial(orjson.dumps, option=orjson.OPT_INDENT_2),
+        orjson.JSONDecodeError,
+    )
+
+def _msgspec_backend():
+    import msgspec
+    encoder = msgspec.json.Encoder()
+    return Backend(
+        'msgspec',
+        msgspec.json.Decoder().decode,
+        encoder.encode,
+        lambda obj: msgspec.json.format(encoder.encode(obj), indent=2),
+        msgspec.DecodeError,
+    )
+
+BACKENDS = {'json': _json_backend, 'orjson': _orjson_backend, 'msgspec': _msgspec_backend}
+
+def get_backend(name='json'):
+    if name == 'auto':
+        for candidate in ('orjson', 'msgspec'):
+            try:
+                return BACKENDS[candidate]()
+            except ImportError:
+                pass
+        return _json_backend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}")
+    return BACKENDS[name]()
+
+def detect_compression(file_path):
+    with open(file_path, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+# Binary reader that decompresses transparently and skips a leading UTF-8 BOM
+def open_input(file_path):
+    compression = detect_compression(file_path)
+    f = COMPRESSION_OPENERS[compression](file_path, 'rb') if compression else open(file_path, 'rb')
+    if f.peek(len(UTF8_BOM))[:len(UTF8_BOM)] == UTF8_BOM:
+        f.read(len(UTF8_BOM))
+    return f
+
+def open_text_input(file_path):
+    return io.TextIOWrapper(open_input(file_path), encoding='utf-8')
+
+def open_output(file_path):
+    compression = COMPRESSION_SUFFIXES.get(Path(file_path).suffix.lower())
+    return COMPRESSION_OPENERS[compression](file_path, 'wb') if compression else open(file_path, 'wb')
+
+# Suffix that names the data format, ignoring a trailing compression suffix
+def data_suffix(file_path):
+    suffixes = [suffix.lower() for suffix in Path(file_path).suffixes]
+    if suffixes and suffixes[-1] in COMPRESSION_SUFFIXES:
+        suffixes.pop()
+    return suffixes[-1] if suffixes else ''
+
 def detect_format(file_path):
-    with open(file_path, 'r') as f:
-        first_char = f.read(1)
-    return 'json' if first_char == '[' else 'jsonl'
+    with open_input(file_path) as f:
+        while True:
+            chunk = f.read(4096)
+            first = chunk.lstrip(b' \t\n\r')[:1]
+            if first or not chunk:
+                break
+    return 'json' if first == b'[' else 'jsonl'
 
-def convert_json_to_jsonl(input_path, output_path):
-    with open(input_path, 'r') as input_file, open(output_path, 'w') as output_file:
-        data = json.load(input_file)
+def convert_json_to_jsonl(input_path, output_path, backend=None):
+    backend = backend or get_backend()
+    with open_input(input_path) as input_file, open_output(output_path) as output_file:
+        data = backend.loads(input_file.read())
         for item in data:
-            json.dump(item, output_file)
-            output_file.write('\n')
+            output_file.write(backend.dumps(item))
+            output_file.write(b'\n')
+
+def convert_jsonl_to_json(input_path, output_path, backend=None):
+    backend = backend or get_backend()
+    with open_input(input_path) as input_file, open_output(output_path) as output_file:
+        data = [backend.loads(line) for line in input_file]
+        output_file.write(backend.dumps_indent(data))
+
+def cut_by_buffer_end(error, buf):
+    # True if a JSONDecodeError may only mean the text continues past the buffer: an open
+    # string (reported at its start) or an error within TAIL_SIZE of the end. Anything
+    # earlier is malformed however much more is read.
+    return error.msg.startswith('Unterminated string') or error.pos >= len(buf) - TAIL_SIZE
+
+# Incremental parsing: yield the elements of a top-level JSON array one at a time,
+# so only the current record (plus one read chunk) is held in memory.
+def iter_json_array(input_file, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill(min_size):
+        nonlocal buf, pos, eof
+        chunk = input_file.read(max(chunk_size, min_size))
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def next_token():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return ''
+            fill(0)
+
+    if next_token() != '[':
+        raise ValueError("Input is not a JSON array")
+    pos += 1
+    if next_token() == ']':
+        return
+    while True:
+        next_token()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if eof or not cut_by_buffer_end(e, buf):
+                    raise
+                # Record spans the buffer end; grow geometrically to keep parsing linear
+                fill(len(buf) - pos)
+                continue
+            # A value must be followed by whitespace, ',' or ']'. Anything else (or the buffer
+            # end) means a number was cut by the chunk boundary, e.g. '1.' of '1.5' or '4e' of '4e10'
+            if not eof and (end == len(buf) or buf[end] not in ARRAY_DELIMITERS):
+                fill(len(buf) - pos)
+                continue
+            break
+        pos = end
+        yield item
+        token = next_token()
+        pos += 1
+        if token == ']':
+            return
+        if token != ',':
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {token!r}")
+
+def iter_jsonl(input_file, backend=None):
+    backend = backend or get_backend()
+    for line in input_file:
+        if line.strip():
+            yield backend.loads(line)
+
+# Indented record nested one level inside the top-level array
+def _dump_array_item(backend, item):
+    return backend.dumps_indent(item).replace(b'\n', b'\n  ')
+
+# Write items as a JSON array with the same layout as the backend's indent=2 dump of a list
+def write_json_array(items, output_file, backend=None):
+    backend = backend or get_backend()
+    first = True
+    for item in items:
+        output_file.write(b'[\n  ' if first else b',\n  ')
+        output_file.write(_dump_array_item(backend, item))
+        first = False
+    output_file.write(b'[]' if first else b'\n]')
+
+def convert_json_to_jsonl_stream(input_path, output_path, backend=None):
+    backend = backend or get_backend()
+    with open_text_input(input_path) as input_file, open_output(output_path) as output_file:
+        for item in iter_json_array(input_file):
+            output_file.write(backend.dumps(item))
+            output_file.write(b'\n')
+
+def convert_jsonl_to_json_stream(input_path, output_path, backend=None):
+    backend = backend or get_backend()
+    with open_input(input_path) as input_file, open_output(output_path) as output_file:
+        write_json_array(iter_jsonl(input_file, backend), output_file, backend)
+
+# Parallel path: split a JSONL file into newline-aligned byte ranges and
+# process each range in a worker, stitching results back in file order.
+def split_ranges(file_path, num_shards):
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ranges = []
+        start = 0
+        for i in range(1, num_shards + 1):
+            if start >= size:
+                break
+            end = size if i == num_shards else max(size * i // num_shards, start)
+            newline = mm.find(b'\n', end) if end < size else -1
+            end = size if newline == -1 else newline + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _read_range(file_path, start, end):
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm[start:end]
+
+def _convert_range(task):
+    file_path, start, end, backend_name = task
+    backend = get_backend(backend_name)
+    pieces = []
+    for line in _read_range(file_path, start, end).split(b'\n'):
+        if line.strip():
+            pieces.append(_dump_array_item(backend, backend.loads(line)))
+    return b',\n  '.join(pieces)
+
+def _validate_range(task):
+    file_path, start, end, backend_name = task
+    lines = _read_range(file_path, start, end).split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    return _validate_lines(lines, get_backend(backend_name))
 
-def convert_jsonl_to_json(input_path, output_path):
-    with open(input_path, 'r') as input_file, open(output_path, 'w') as output_file:
-        data = [json.loads(line) for line in input_file]
-        json.dump(data, output_file, indent=2)
+def _validate_lines(lines, backend):
+    num_lines = 0
+    records = 0
+    errors = []
+    for num_lines, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            backend.loads(line)
+            records += 1
+        except backend.decode_error as e:
+            errors.append((num_lines, str(e)))
+    return num_lines, records, errors
+
+def _shard_tasks(file_path, workers, backend):
+    num_shards = max(workers * 4, os.path.getsize(file_path) // SHARD_SIZE)
+    return [(str(file_path), start, end, backend.name) for start, end in split_ranges(file_path, num_shards)]
+
+def ordered_map(pool, func, tasks, window):
+    # Like Pool.imap, but never reads more than `window` tasks ahead of the consumer, so
+    # finished results cannot pile up in memory when the consumer is the slow side
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def convert_jsonl_to_json_parallel(input_path, output_path, workers, backend=None):
+    backend = backend or get_backend()
+    with Pool(workers) as pool, open_output(output_path) as output_file:
+        first = True
+        tasks = _shard_tasks(input_path, workers, backend)
+        for piece in ordered_map(pool, _convert_range, tasks, workers * SHARDS_IN_FLIGHT):
+            if not piece:
+                continue
+            output_file.write(b'[\n  ' if first else b',\n  ')
+            output_file.write(piece)
+            first = False
+        output_file.write(b'[]' if first else b'\n]')
+
+def _merge_validation(results):
+    line_offset = 0
+    records = 0
+    errors = []
+    for num_lines, num_records, shard_errors in results:
+        errors.extend((line_offset + lineno, message) for lineno, message in shard_errors)
+        line_offset += num_lines
+        records += num_records
+    return records, errors
+
+def validate_jsonl(input_path, workers=1, backend=None):
+    backend = backend or get_backend()
+    if detect_compression(input_path):
+        # Compressed input cannot be split by byte offset; validate it as one stream
+        with open_input(input_path) as input_file:
+            return _merge_validation([_validate_lines(input_file, backend)])
+    tasks = _shard_tasks(input_path, workers, backend)
+    if workers > 1:
+        with Pool(workers) as pool:
+            return _merge_validation(pool.imap(_validate_range, tasks))
+    return _merge_validation(map(_validate_range, tasks))
+
+# Line-offset index: a sidecar '<file>.idx' holding the byte offset of every
+# non-blank line, so record N, samples and shards are reached with one seek.
+def index_path(file_path):
+    return Path(f"{file_path}.idx")
+
+def build_index(file_path):
+    stat = os.stat(file_path)
+    count = 0
+    position = 0
+    tmp_path = Path(f"{index_path(file_path)}.tmp")
+    with open(file_path, 'rb') as input_file, open(tmp_path, 'wb') as index_file:
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, 0, 0, 0))
+        for line in input_file:
+            if line.strip():
+                index_file.write(INDEX_OFFSET.pack(position))
+                count += 1
+            position += len(line)
+        index_file.seek(0)
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, count))
+    os.replace(tmp_path, index_path(file_path))
+    return count
+
+class JsonlIndex:
+    def __init__(self, file_path, rebuild=True):
+        self.file_path = Path(file_path)
+        if not self._is_fresh():
+            if not rebuild:
+                raise ValueError(f"Index for {file_path} is missing or out of date")
+            build_index(file_path)
+        with open(index_path(file_path), 'rb') as index_file:
+            self._index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = INDEX_HEADER.unpack_from(self._index)[3]
+        self.size = os.path.getsize(file_path)
+        self._file = open(file_path, 'rb')
+
+    def _is_fresh(self):
+        try:
+            with open(index_path(self.file_path), 'rb') as index_file:
+                magic, size, mtime_ns, count = INDEX_HEADER.unpack(index_file.read(INDEX_HEADER.size))
+            stat = os.stat(self.file_path)
+        except (OSError, struct.error):
+            return False
+        expected = INDEX_HEADER.size + count * INDEX_OFFSET.size
+        return (magic == INDEX_MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns
+                and os.path.getsize(index_path(self.file_path)) == expected)
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, n):
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError(f"Record {n} out of range (0..{self.count - 1})")
+        return INDEX_OFFSET.unpack_from(self._index, INDEX_HEADER.size + n * INDEX_OFFSET.size)[0]
+
+    def get_line(self, n):
+        self._file.seek(self.offset(n))
+        return self._file.readline()
+
+    def get(self, n, backend=None):
+        return (backend or get_backend()).loads(self.get_line(n))
+
+    def sample(self, k, seed=None):
+        # Seek in file order for locality, but return records in sampled order
+        picks = random.Random(seed).sample(range(self.count), min(k, self.count))
+        lines = {n: self.get_line(n) for n in sorted(picks)}
+        return [lines[n] for n in picks]
+
+    def shard_bounds(self, num_shards):
+        bounds = []
+        for i in range(num_shards):
+            first = i * self.count // num_shards
+            last = (i + 1) * self.count // num_shards
+            start = self.offset(first) if first < self.count else self.size
+            end = self.offset(last) if last < self.count else self.size
+            bounds.append((start, end))
+        return bounds
+
+    def write_shards(self, num_shards, output_prefix):
+        paths = []
+        for i, (start, end) in enumerate(self.shard_bounds(num_shards)):
+            shard_path = Path(f"{output_prefix}-{i:05d}.jsonl")
+            self._file.seek(start)
+            with open(shard_path, 'wb') as output_file:
+                remaining = end - start
+                while remaining:
+                    chunk = self._file.read(min(CHUNK_SIZE, remaining))
+                    output_file.write(chunk)
+                    remaining -= len(chunk)
+            paths.append(shard_path)
+        return paths
+
+    def close(self):
+        self._index.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python script.py <input_file> <output_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Convert between JSON arrays and JSONL.")
+    parser.add_argument("input_file", type=Path)
+    parser.add_argument("output_file", type=Path, nargs="?")
+    parser.add_argument("--stream", action="store_true",
+                        help="convert record by record with memory bounded by the largest record")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="process JSONL input in parallel byte-range shards")
+    parser.add_argument("--validate", action="store_true",
+                        help="only check that every JSONL line parses")
+    parser.add_argument("--backend", choices=['auto', *BACKENDS], default='json',
+                        help="JSON library to use; auto prefers orjson, then msgspec, which are faster "
+                             "but turn integers wider than 64 bits into floats and reject NaN")
+    parser.add_argument("--build-index", action="store_true",
+                        help="write the '<input>.idx' line-offset sidecar for a JSONL file")
+    parser.add_argument("--get", type=int, metavar="N",
+                        help="print record N (0-based) using the line-offset index")
+    parser.add_argument("--sample", type=int, metavar="K",
+                        help="print K random records using the line-offset index")
+    parser.add_argument("--seed", type=int, help="random seed for --sample")
+    parser.add_argument("--shards", type=int, metavar="K",
+                        help="split into K shards of equal record count named '<output_file>-00000.jsonl'")
+    args = parser.parse_args()
 
-    input_path = Path(sys.argv[1])
-    output_path = Path(sys.argv[2])
+    input_path = args.input_file
+    output_path = args.output_file
 
     input_format = detect_format(input_path)
-    output_format = 'json' if output_path.suffix.lower() == '.json' else 'jsonl'
+    try:
+        backend = get_backend(args.backend)
+    except ImportError:
+        parser.error(f"JSON backend '{args.backend}' is not installed")
+
+    uses_index = args.build_index or args.get is not None or args.sample is not None or args.shards is not None
+    if uses_index and detect_compression(input_path):
+        parser.error("the line-offset index needs an uncompressed JSONL file")
+
+    if args.build_index:
+        print(f"Indexed {build_index(input_path)} records into {index_path(input_path)}.")
+        return
+
+    if args.get is not None or args.sample is not None:
+        with JsonlIndex(input_path) as index:
+            lines = [index.get_line(args.get)] if args.get is not None else index.sample(args.sample, args.seed)
+        for line in lines:
+            sys.stdout.buffer.write(line.rstrip(b'\r\n') + b'\n')
+        return
+
+    if args.shards is not None:
+        if output_path is None:
+            parser.error("--shards needs an output_file prefix")
+        prefix = output_path.with_suffix('') if output_path.suffix.lower() == '.jsonl' else output_path
+        with JsonlIndex(input_path) as index:
+            paths = index.write_shards(args.shards, prefix)
+        print(f"Wrote {len(paths)} shards of {len(index)} records to {prefix}-*.jsonl.")
+        return
+
+    if args.validate:
+        if input_format == 'json':
+            with open_text_input(input_path) as input_file:
+                records = sum(1 for _ in iter_json_array(input_file))
+            print(f"Valid JSON array with {records} records.")
+            return
+        records, errors = validate_jsonl(input_path, args.workers, backend)
+        for lineno, message in errors[:20]:
+            print(f"Line {lineno}: {message}")
+        print(f"{records} valid records, {len(errors)} invalid lines.")
+        sys.exit(1 if errors else 0)
+
+    if output_path is None:
+        parser.error("output_file is required unless --validate is given")
+    output_format = 'json' if data_suffix(output_path) == '.json' else 'jsonl'
 
     if input_format == output_format:
         print(f"Input and output formats are the same ({input_format}). No conversion needed.")
         return
 
     if input_format == 'json' and output_format == 'jsonl':
-        convert_json_to_jsonl(input_path, output_path)
+        convert = convert_json_to_jsonl_stream if args.stream else convert_json_to_jsonl
+    else:
+        convert = convert_jsonl_to_json_stream if args.stream else convert_jsonl_to_json
+    if args.workers > 1 and input_format == 'jsonl' and not detect_compression(input_path):
+        convert_jsonl_to_json_parallel(input_path, output_path, args.workers, backend)
     else:
-        convert_jsonl_to_json(input_path, output_path)
+        convert(input_path, output_path, backend)
 
     print(f"Conversion from {input_format.upper()} to {output_format.upper()} completed.")
 
@@ -1,58 +1,473 @@
-from sentence_transformers import SentenceTransformer, util
 from PIL import Image
+import argparse
 import glob
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import shutil
+import time
+from row_store import RowStore
 
-# Load the pre-trained model from sentence transformers
-model = SentenceTransformer('clip-ViT-B-32')
-
-# Load and sort image names from the directory alphabetically
-img_names = sorted(glob.glob('/home/kevin/generate-ts/image-search-kat/jpgs/*.jpg'))
-print("Images:", len(img_names))
-
-# Generate embeddings for the images
-img_emb = model.encode([Image.open(filepath) for filepath in img_names], batch_size=128, convert_to_tensor=True, show_progress_bar=True)
-
-def remove_duplicate_images(img_names, img_emb, similarity_threshold=0.95):
-    # Calculate cosine similarity matrix
-    cosine_sim = util.cos_sim(img_emb, img_emb)
-    
-    # Convert to numpy array for easier manipulation
-    cosine_sim_np = cosine_sim.numpy()
-    
-    # Ignore self-similarity by setting diagonal to zero
-    np.fill_diagonal(cosine_sim_np, 0)
-    
-    # Initialize set for indices of images to remove and list for tracking duplicates
-    to_remove = set()
+IMAGE_GLOB = '/home/kevin/generate-ts/image-search-kat/jpgs/*.jpg'
+DUPLICATES_FOLDER = '/home/kevin/generate-ts/image-search-kat/dup2'
+CACHE_FOLDER = '/home/kevin/generate-ts/image-search-kat/embedding-cache'
+MODEL_NAME = 'clip-ViT-B-32'
+
+# CLIP ViT-B/32 input resolution; images are decoded straight down to about this size
+IMAGE_SIZE = 224
+ENCODE_BATCH_SIZE = 128
+DECODE_WORKERS = 8
+# Decoded batches waiting for the encoder; bounds memory to a few batches of thumbnails
+PREFETCH_BATCHES = 2
+# dHash grid: 16 x 16 gradient bits, so only near-identical pictures share a hash
+DHASH_SIZE = 16
+# Mean absolute difference (0-255) of 8x8 colour thumbnails for a dHash match to count
+COLOR_TOLERANCE = 8
+
+# Rows per similarity tile: memory is bounded by block_size x block_size floats
+BLOCK_SIZE = 4096
+
+# Random-hyperplane LSH over mean-centred vectors. Centring lowers a pair's cosine: at 0.975
+# in a CLIP-like cone (unrelated images ~0.5) it is ~0.95 after centring, so the pair shares
+# a 12-bit code in one table with probability ~0.28 and 16 tables find it ~99.5% of the time
+LSH_TABLES = 16
+LSH_BITS = 12
+# Neighbours fetched per image by the faiss/hnswlib graph indexes
+ANN_NEIGHBORS = 16
+
+def load_model():
+    # Load the pre-trained model from sentence transformers
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class EmbeddingStore(RowStore):
+    # On-disk cache of normalized embeddings: float16 rows in a RowStore plus an SQLite
+    # key table (path, size, mtime, content hash, model, row) so unchanged images
+    # are never re-encoded.
+
+    def __init__(self, folder, model_name, dim):
+        super().__init__(folder, 'embeddings.f16', np.float16, dim)
+        self.model_name = model_name
+        self.db.executescript(
+            "CREATE TABLE IF NOT EXISTS images (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,"
+            " sha1 TEXT, model TEXT, row INTEGER, deduped INTEGER DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS images_sha1 ON images (sha1, model);"
+        )
+        self._hashes = {}
+
+    def lookup(self, paths):
+        # Returns {path: row} for cached images and the list of paths that need encoding
+        cached, missing = {}, []
+        for path in paths:
+            stat = os.stat(path)
+            known = self.db.execute(
+                "SELECT size, mtime_ns, row FROM images WHERE path = ? AND model = ?", (path, self.model_name)
+            ).fetchone()
+            if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+                cached[path] = known[2]
+                continue
+            # New or touched file: reuse any row with identical content (copies, renames, touch)
+            sha1 = file_hash(path)
+            same = self.db.execute(
+                "SELECT row FROM images WHERE sha1 = ? AND model = ? LIMIT 1", (sha1, self.model_name)
+            ).fetchone()
+            if same:
+                self._put(path, stat, sha1, same[0])
+                cached[path] = same[0]
+            else:
+                self._hashes[path] = sha1
+                missing.append(path)
+        self.db.commit()
+        return cached, missing
+
+    def _put(self, path, stat, sha1, row):
+        self.db.execute(
+            "INSERT OR REPLACE INTO images (path, size, mtime_ns, sha1, model, row, deduped) VALUES (?, ?, ?, ?, ?, ?, 0)",
+            (path, stat.st_size, stat.st_mtime_ns, sha1, self.model_name, row),
+        )
+
+    def add(self, paths, embeddings):
+        start = self.append(normalize_embeddings(embeddings))
+        for offset, path in enumerate(paths):
+            sha1 = self._hashes.pop(path, None) or file_hash(path)
+            self._put(path, os.stat(path), sha1, start + offset)
+        self.db.commit()
+
+    def embeddings(self, rows, dtype=np.float32):
+        return self.take(rows, dtype)
+
+    def deduped(self, paths):
+        return {
+            path for path in paths
+            if (self.db.execute("SELECT deduped FROM images WHERE path = ?", (path,)).fetchone() or (0,))[0]
+        }
+
+    def mark_deduped(self, paths):
+        self.db.executemany("UPDATE images SET deduped = 1 WHERE path = ?", ((path,) for path in paths))
+        self.db.commit()
+
+    def forget(self, paths):
+        self.db.executemany("DELETE FROM images WHERE path = ?", ((path,) for path in paths))
+        self.db.commit()
+
+def encode_images(model, img_names, store=None, dtype=np.float32, timings=None):
+    # Encode only what the store does not already hold. Returns the names that could be
+    # read, their normalized embeddings, and (path, error) for files that failed to decode
+    if store is None:
+        names, emb, failed = encode_image_files(model, img_names, timings=timings)
+        return names, normalize_embeddings(emb), failed
+    cached, missing = store.lookup(img_names)
+    print(f"Embeddings cached: {len(cached)}, to encode: {len(missing)}")
+    failed = []
+    if missing:
+        encoded, emb, failed = encode_image_files(model, missing, timings=timings)
+        if encoded:
+            store.add(encoded, emb)
+        cached.update(store.lookup(encoded)[0])
+    names = [name for name in img_names if name in cached]
+    return names, store.embeddings([cached[name] for name in names], dtype), failed
+
+def load_image(path, size=IMAGE_SIZE):
+    # Decode at reduced resolution (JPEG DCT scaling) and shrink the short side to `size`
+    with Image.open(path) as img:
+        img.draft('RGB', (size, size))
+        img = img.convert('RGB')
+    scale = size / min(img.size)
+    if scale < 1:
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BICUBIC)
+    return img
+
+def iter_image_batches(img_names, batch_size=ENCODE_BATCH_SIZE, workers=DECODE_WORKERS, prefetch=PREFETCH_BATCHES):
+    # Decode batches on a thread pool while the caller encodes the previous one.
+    # Yields (paths, images, failed) with failed as (path, error) pairs.
+    with ThreadPoolExecutor(workers) as pool:
+        batches = (img_names[i:i + batch_size] for i in range(0, len(img_names), batch_size))
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, [pool.submit(load_image, path) for path in batch]))
+            if len(pending) > prefetch:
+                yield collect_batch(*pending.popleft())
+        while pending:
+            yield collect_batch(*pending.popleft())
+
+def collect_batch(paths, futures):
+    ok_paths, images, failed = [], [], []
+    for path, future in zip(paths, futures):
+        try:
+            images.append(future.result())
+            ok_paths.append(path)
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+            failed.append((path, e))
+    return ok_paths, images, failed
+
+def encode_image_files(model, img_names, batch_size=ENCODE_BATCH_SIZE, workers=DECODE_WORKERS, timings=None):
+    start = time.perf_counter()
+    names, chunks, failed = [], [], []
+    for paths, images, batch_failed in iter_image_batches(img_names, batch_size, workers):
+        failed.extend(batch_failed)
+        if images:
+            chunks.append(normalize_embeddings(model.encode(images, batch_size=len(images), show_progress_bar=False)))
+            names.extend(paths)
+        print(f"Encoded {len(names)}/{len(img_names)} images ({len(failed)} unreadable)", end='\r', flush=True)
+    print()
+    for path, error in failed:
+        print(f"Skipped unreadable image {path}: {error}")
+    if timings is not None:
+        timings['encoded'] = timings.get('encoded', 0) + len(img_names)
+        timings['encode_seconds'] = timings.get('encode_seconds', 0.0) + time.perf_counter() - start
+    dim = model.get_sentence_embedding_dimension()
+    return names, np.concatenate(chunks) if chunks else np.zeros((0, dim), dtype=np.float32), failed
+
+def perceptual_hash(path, hash_size=DHASH_SIZE):
+    # Difference hash (sign of horizontal gradients on a tiny grayscale thumbnail) and an
+    # 8x8 colour thumbnail used to confirm matches, since dHash ignores colour
+    with Image.open(path) as img:
+        img.draft('RGB', (hash_size * 4, hash_size * 4))
+        img = img.convert('RGB')
+    gray = np.asarray(img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    colors = np.asarray(img.resize((8, 8), Image.BOX), dtype=np.int16)
+    return np.packbits(gray[:, 1:] > gray[:, :-1]).tobytes(), colors
+
+def group_by_key(img_names, keys):
+    # Groups of names sharing a key, each sorted so the lexicographically first is kept
+    groups = {}
+    for name, key in zip(img_names, keys):
+        groups.setdefault(key, []).append(name)
+    return [sorted(group) for group in groups.values()]
+
+def prefilter_duplicates(img_names, workers=DECODE_WORKERS):
+    # Cheap cascade before CLIP: byte-identical files (size, then sha1), then identical
+    # dHash with matching colour thumbnails among the survivors. Returns the representatives to encode, the duplicates
+    # removed, and per-stage (name, removed, seconds) stats.
+    stats = []
+
+    start = time.perf_counter()
+    by_size = group_by_key(img_names, (os.path.getsize(name) for name in img_names))
+    survivors = [group[0] for group in by_size if len(group) == 1]
+    # Only files that share their size with another file need to be read and hashed
+    same_size = [name for group in by_size if len(group) > 1 for name in group]
+    with ThreadPoolExecutor(workers) as pool:
+        hashes = list(pool.map(file_hash, same_size))
     duplicates = []
-    
-    # Iterate over the similarity matrix and identify duplicates
-    for i in range(len(cosine_sim_np)):
-        for j in range(i + 1, len(cosine_sim_np)):
-            if cosine_sim_np[i, j] > similarity_threshold:
-                # Check which image to keep: the one with the lower index, i.e., lexicographically earlier
-                if img_names[i] < img_names[j]:
-                    to_remove.add(j)
-                    duplicates.append(img_names[j])
-                else:
-                    to_remove.add(i)
-                    duplicates.append(img_names[i])
-    
-    # Retain unique images
-    unique_img_names = [img for i, img in enumerate(img_names) if i not in to_remove]
-    
+    for same in group_by_key(same_size, zip(map(os.path.getsize, same_size), hashes)):
+        survivors.append(same[0])
+        duplicates.extend(same[1:])
+    stats.append(('exact hash', len(duplicates), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    removed = len(duplicates)
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [pool.submit(perceptual_hash, name) for name in survivors]
+    representatives = []
+    perceptual = {}
+    for name, future in zip(survivors, futures):
+        try:
+            perceptual[name] = future.result()
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+            # Leave unreadable files to the encoder, which reports them
+            representatives.append(name)
+    for same in group_by_key(perceptual, (perceptual[name][0] for name in perceptual)):
+        kept = []
+        for name in same:
+            colors = perceptual[name][1]
+            if any(np.abs(colors - perceptual[other][1]).mean() <= COLOR_TOLERANCE for other in kept):
+                duplicates.append(name)
+            else:
+                kept.append(name)
+        representatives.extend(kept)
+    stats.append(('perceptual hash', len(duplicates) - removed, time.perf_counter() - start))
+
+    return sorted(representatives), duplicates, stats
+
+def normalize_embeddings(img_emb):
+    # Accept torch tensors or arrays; unit rows turn dot products into cosine similarity
+    if hasattr(img_emb, 'cpu'):
+        img_emb = img_emb.cpu().numpy()
+    emb = np.asarray(img_emb, dtype=np.float32)
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    return emb / np.maximum(norms, 1e-12)
+
+def iter_similar_pairs(emb, similarity_threshold, block_size=BLOCK_SIZE):
+    # Yield (rows, cols) index arrays of pairs i < j above the threshold, one tile at a time
+    n = len(emb)
+    for i0 in range(0, n, block_size):
+        i1 = min(i0 + block_size, n)
+        for j0 in range(i0, n, block_size):
+            j1 = min(j0 + block_size, n)
+            tile = emb[i0:i1] @ emb[j0:j1].T
+            if i0 == j0:
+                # Diagonal tile: keep only the strict upper triangle (no self or mirrored pairs)
+                tile = np.triu(tile, k=1)
+            rows, cols = np.nonzero(tile > similarity_threshold)
+            if len(rows):
+                yield rows + i0, cols + j0
+
+def iter_lsh_pairs(emb, similarity_threshold, block_size=BLOCK_SIZE, num_tables=LSH_TABLES, num_bits=LSH_BITS, seed=0):
+    # Only images that share a hash bucket in some table are compared exactly.
+    # CLIP embeddings sit in a narrow cone (unrelated images have cosine ~0.5), so hyperplanes
+    # through the origin would put most images on the same side; hash the centred vectors
+    # instead and keep the exact check on the originals.
+    rng = np.random.default_rng(seed)
+    bit_weights = 1 << np.arange(num_bits, dtype=np.int64)
+    centred = normalize_embeddings(emb - emb.mean(axis=0))
+    for _ in range(num_tables):
+        planes = rng.standard_normal((emb.shape[1], num_bits)).astype(np.float32)
+        codes = (centred @ planes > 0) @ bit_weights
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(order)]))
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            members = order[start:end]
+            for rows, cols in iter_similar_pairs(emb[members], similarity_threshold, block_size):
+                yield members[rows], members[cols]
+
+def _knn_pairs(i0, labels, sims, similarity_threshold):
+    rows = np.arange(i0, i0 + len(labels))[:, None]
+    # Keep i -> j even when j did not return i (the graph search is not symmetric);
+    # group_duplicates does not mind a pair reported from both ends
+    mask = (labels >= 0) & (labels != rows) & (sims > similarity_threshold)
+    return np.broadcast_to(rows, labels.shape)[mask], labels[mask]
+
+def iter_faiss_pairs(emb, similarity_threshold, block_size=BLOCK_SIZE, neighbors=ANN_NEIGHBORS):
+    import faiss
+    index = faiss.IndexHNSWFlat(emb.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+    index.add(emb)
+    k = min(neighbors + 1, len(emb))
+    for i0 in range(0, len(emb), block_size):
+        sims, labels = index.search(emb[i0:i0 + block_size], k)
+        yield _knn_pairs(i0, labels, sims, similarity_threshold)
+
+def iter_hnswlib_pairs(emb, similarity_threshold, block_size=BLOCK_SIZE, neighbors=ANN_NEIGHBORS):
+    import hnswlib
+    index = hnswlib.Index(space='ip', dim=emb.shape[1])
+    index.init_index(max_elements=len(emb), ef_construction=200, M=32)
+    index.add_items(emb, np.arange(len(emb)))
+    k = min(neighbors + 1, len(emb))
+    index.set_ef(max(2 * k, 64))
+    for i0 in range(0, len(emb), block_size):
+        labels, distances = index.knn_query(emb[i0:i0 + block_size], k)
+        # hnswlib reports inner-product distance as 1 - dot
+        yield _knn_pairs(i0, labels.astype(np.int64), 1 - distances, similarity_threshold)
+
+PAIR_FINDERS = {
+    'exact': iter_similar_pairs,
+    'lsh': iter_lsh_pairs,
+    'faiss': iter_faiss_pairs,
+    'hnswlib': iter_hnswlib_pairs,
+}
+
+def ann_recall(img_emb, similarity_threshold, method, sample_size=2000, seed=0):
+    # Fraction of the exact above-threshold pairs that the ANN method also finds, over the
+    # pairs that touch a random sample of query images. Both sides run against the full
+    # matrix: sampling images instead would keep a pair only if both ends were drawn.
+    emb = normalize_embeddings(img_emb)
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(len(emb), size=min(sample_size, len(emb)), replace=False))
+    in_sample = np.zeros(len(emb), dtype=bool)
+    in_sample[sample] = True
+
+    exact = set()
+    for rows, cols in iter_cross_pairs(emb[sample], emb, similarity_threshold):
+        rows = sample[rows]
+        keep = rows != cols
+        exact.update(zip(np.minimum(rows, cols)[keep].tolist(), np.maximum(rows, cols)[keep].tolist()))
+    approx = set()
+    for rows, cols in PAIR_FINDERS[method](emb, similarity_threshold):
+        keep = in_sample[rows] | in_sample[cols]
+        approx.update(zip(np.minimum(rows, cols)[keep].tolist(), np.maximum(rows, cols)[keep].tolist()))
+    recall = len(exact & approx) / len(exact) if exact else 1.0
+    return recall, len(exact), len(approx)
+
+def iter_cross_pairs(query, base, similarity_threshold, block_size=BLOCK_SIZE):
+    # Yield (query rows, base rows) above the threshold; base may be a float16 memmap
+    for j0 in range(0, len(base), block_size):
+        base_block = np.asarray(base[j0:j0 + block_size], dtype=np.float32)
+        for i0 in range(0, len(query), block_size):
+            tile = query[i0:i0 + block_size] @ base_block.T
+            rows, cols = np.nonzero(tile > similarity_threshold)
+            if len(rows):
+                yield rows + i0, cols + j0
+
+def find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def group_duplicates(n, pairs):
+    # Union-find over all similar pairs; returns the root of each index
+    parent = list(range(n))
+    for rows, cols in pairs:
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            root_i, root_j = find(parent, i), find(parent, j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+    return [find(parent, i) for i in range(n)]
+
+def remove_duplicate_images(img_names, img_emb, similarity_threshold=0.95, block_size=BLOCK_SIZE, method='exact'):
+    emb = normalize_embeddings(img_emb)
+    pairs = PAIR_FINDERS[method](emb, similarity_threshold, block_size)
+    return split_keepers(img_names, group_duplicates(len(img_names), pairs))
+
+def remove_duplicate_images_incremental(old_names, old_emb, new_names, new_emb, similarity_threshold=0.95, block_size=BLOCK_SIZE):
+    # Old images were already deduplicated against each other, so only new x old and
+    # new x new pairs are compared; indexes run over old_names + new_names
+    new_emb = normalize_embeddings(new_emb)
+    n_old = len(old_names)
+
+    def pairs():
+        for rows, cols in iter_cross_pairs(new_emb, old_emb, similarity_threshold, block_size):
+            yield cols, rows + n_old
+        for rows, cols in iter_similar_pairs(new_emb, similarity_threshold, block_size):
+            yield rows + n_old, cols + n_old
+
+    img_names = list(old_names) + list(new_names)
+    return split_keepers(img_names, group_duplicates(len(img_names), pairs()))
+
+def split_keepers(img_names, roots):
+    # Keep the lexicographically first image of every group of duplicates
+    keepers = {}
+    for i, root in enumerate(roots):
+        if root not in keepers or img_names[i] < img_names[keepers[root]]:
+            keepers[root] = i
+
+    unique_img_names = [img for i, img in enumerate(img_names) if keepers[roots[i]] == i]
+    duplicates = [img for i, img in enumerate(img_names) if keepers[roots[i]] != i]
+
     return unique_img_names, duplicates
 
-# Set the similarity thresh
-similarity_threshold = 0.97
-unique_img_names, duplicates = remove_duplicate_images(img_names, img_emb, similarity_threshold)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move near-duplicate images out of a folder using CLIP embeddings.")
+    parser.add_argument("--method", choices=list(PAIR_FINDERS), default='exact',
+                        help="exact tiled comparison, built-in LSH, or a faiss/hnswlib graph index")
+    parser.add_argument("--threshold", type=float, default=0.97)
+    parser.add_argument("--recall-sample", type=int, default=0,
+                        help="report recall of --method against the exact pass for the pairs of this many sampled images")
+    parser.add_argument("--cache", default=CACHE_FOLDER,
+                        help="embedding cache folder ('' disables the cache)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only compare images not yet deduplicated against the rest (needs --cache)")
+    parser.add_argument("--no-prefilter", dest="prefilter", action="store_false",
+                        help="send every image to CLIP instead of first removing exact and dHash duplicates")
+    args = parser.parse_args()
+
+    model = load_model()
+    store = EmbeddingStore(args.cache, MODEL_NAME, model.get_sentence_embedding_dimension()) if args.cache else None
+
+    # Load and sort image names from the directory alphabetically
+    img_names = sorted(glob.glob(IMAGE_GLOB))
+    print("Images:", len(img_names))
+
+    # Only images not yet deduplicated go through the prefilter in incremental mode
+    incremental = args.incremental and store is not None
+    done = store.deduped(img_names) if incremental else set()
+    pre_duplicates = []
+    if args.prefilter:
+        candidates = [name for name in img_names if name not in done]
+        representatives, pre_duplicates, stages = prefilter_duplicates(candidates)
+        for stage, removed, seconds in stages:
+            print(f"Prefilter {stage}: {removed} duplicates in {seconds:.1f}s")
+        img_names = sorted(done.union(representatives))
+
+    # Generate embeddings for the images (kept as float16 when only new images are compared)
+    timings = {}
+    img_names, img_emb, failed = encode_images(model, img_names, store, np.float16 if incremental else np.float32, timings)
+    if pre_duplicates and timings.get('encoded'):
+        per_image = timings['encode_seconds'] / timings['encoded']
+        print(f"Prefilter skipped CLIP for {len(pre_duplicates)} images, ~{len(pre_duplicates) * per_image:.1f}s saved")
+
+    if args.recall_sample and args.method != 'exact':
+        recall, exact_pairs, approx_pairs = ann_recall(img_emb, args.threshold, args.method, args.recall_sample)
+        print(f"{args.method} recall over pairs of {args.recall_sample} sampled images: {recall:.3f} ({exact_pairs} exact pairs, {approx_pairs} found)")
+
+    if incremental:
+        old = [i for i, name in enumerate(img_names) if name in done]
+        new = [i for i, name in enumerate(img_names) if name not in done]
+        print(f"Incremental run: {len(new)} new images against {len(old)} already deduplicated")
+        unique_img_names, duplicates = remove_duplicate_images_incremental(
+            [img_names[i] for i in old], img_emb[old], [img_names[i] for i in new], img_emb[new], args.threshold)
+    else:
+        unique_img_names, duplicates = remove_duplicate_images(img_names, img_emb, args.threshold, method=args.method)
+    duplicates = pre_duplicates + duplicates
+
+    print(f"Original number of images: {len(img_names) + len(pre_duplicates)} ({len(failed)} unreadable files skipped)")
+    print(f"Number of unique images after removal: {len(unique_img_names)}")
+    print(f"Number of duplicated images: {len(duplicates)}")
 
-print(f"Original number of images: {len(img_names)}")
-print(f"Number of unique images after removal: {len(unique_img_names)}")
-print(f"Number of duplicated images: {len(duplicates)}")
+    # Move duplicates to a new folder
+    for duplicate in duplicates:
+        shutil.move(duplicate, DUPLICATES_FOLDER)
 
-# Move duplicates to a new folder
-for duplicate in duplicates:
-    shutil.move(duplicate, '/home/kevin/generate-ts/image-search-kat/dup2')
+    if store is not None:
+        store.forget(duplicates)
+        store.mark_deduped(unique_img_names)
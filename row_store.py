@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import numpy as np
+
+
+class RowStore:
+    # Append-only matrix of vectors on disk: a memmap file whose capacity doubles when full,
+    # plus an SQLite database whose `meta` table records the width and the rows in use.
+    # Subclasses keep their key tables in the same database and point them at rows.
+
+    def __init__(self, folder, matrix_name, dtype, dim=None, db_name='keys.sqlite'):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.dtype = np.dtype(dtype)
+        self.matrix_path = os.path.join(folder, matrix_name)
+        self.db = sqlite3.connect(os.path.join(folder, db_name))
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('rows', 0)")
+        self.db.commit()
+        self.rows = self._meta('rows')
+        self.dim = self._meta('dim')
+        self.matrix = None
+        if self.dim is not None:
+            self._open_matrix(max(self.rows, 1024))
+        if dim is not None:
+            self._set_dim(dim)
+
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_dim(self, dim):
+        # The width is fixed by the first vectors stored (or by the caller up front)
+        if self.dim is None:
+            self.dim = dim
+            self.db.execute("INSERT INTO meta VALUES ('dim', ?)", (dim,))
+            self.db.commit()
+            self._open_matrix(1024)
+        elif dim != self.dim:
+            raise ValueError(f"Cache in {self.folder} holds {self.dim}-d embeddings, got {dim}-d")
+
+    def _open_matrix(self, min_capacity):
+        row_bytes = self.dim * self.dtype.itemsize
+        size = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        capacity = max(size // row_bytes, min_capacity)
+        if capacity * row_bytes != size:
+            with open(self.matrix_path, 'ab') as f:
+                f.truncate(capacity * row_bytes)
+        self.matrix = np.memmap(self.matrix_path, dtype=self.dtype, mode='r+', shape=(capacity, self.dim))
+
+    def append(self, vectors):
+        # Writes the vectors after the last row and returns the first new row. The row count
+        # is updated but not committed: callers insert their keys, then commit both together.
+        vectors = np.asarray(vectors)
+        self._set_dim(vectors.shape[1])
+        start = self.rows
+        if start + len(vectors) > len(self.matrix):
+            self.matrix.flush()
+            self._open_matrix(max(2 * len(self.matrix), start + len(vectors)))
+        self.matrix[start:start + len(vectors)] = vectors
+        self.matrix.flush()
+        self.rows = start + len(vectors)
+        self.db.execute("UPDATE meta SET value = ? WHERE key = 'rows'", (self.rows,))
+        return start
+
+    def take(self, rows, dtype=np.float32):
+        return np.asarray(self.matrix[np.asarray(rows, dtype=np.int64)], dtype=dtype)
+
+    def close(self):
+        if self.matrix is not None:
+            self.matrix.flush()
+        self.db.close()
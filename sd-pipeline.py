@@ -1,9 +1,29 @@
+import hashlib
+import json
 import os
 import random
+import time
 import uuid
+from itertools import islice
 from PIL import Image
 import torch
-from diffusers import StableDiffusionXLPipeline, EulerAncestralDiscreteScheduler
+
+# 🎛️ Generation settings shared by every prompt
+NEGATIVE_PROMPT = ""
+WIDTH = 1024
+HEIGHT = 1024
+GUIDANCE_SCALE = 3.0
+NUM_INFERENCE_STEPS = 25
+LORA_SCALE = 0.65
+DEVICE = "cuda"
+# 📦 Prompts rendered per pipeline call; lower it if the GPU runs out of memory
+BATCH_SIZE = 4
+# 📒 Record of finished (prompt, seed, settings) requests, kept in the output directory
+MANIFEST_NAME = "manifest.jsonl"
+MODEL_ID = "fluently/Fluently-XL-v2"
+LORA_ID = "ehristoforu/dalle-3-xl-v2"
+
+_pipeline = None
 
 def save_image(img, output_dir):
     # 🖼️ Save the generated image with a unique name
@@ -20,64 +40,198 @@ def randomize_seed(seed, randomize):
 
 def load_pipeline():
     # 🚀 Load the pipeline
+    from diffusers import StableDiffusionXLPipeline, EulerAncestralDiscreteScheduler
+
     pipe = StableDiffusionXLPipeline.from_pretrained(
-        "fluently/Fluently-XL-v2",
+        MODEL_ID,
         torch_dtype=torch.float16,
         use_safetensors=True,
     )
     pipe.scheduler = EulerAncestralDiscreteScheduler.from_config(pipe.scheduler.config)
-    pipe.load_lora_weights("ehristoforu/dalle-3-xl-v2", weight_name="dalle-3-xl-lora-v2.safetensors", adapter_name="dalle")
+    pipe.load_lora_weights(LORA_ID, weight_name="dalle-3-xl-lora-v2.safetensors", adapter_name="dalle")
     pipe.set_adapters("dalle")
-    pipe.to("cuda")
+    pipe.to(DEVICE)
     return pipe
 
-def generate_image(pipe, prompt, output_dir):
-    # 🖌️ Generate image for the prompt
-    negative_prompt = ""
-    seed = 0
-    width = 1024
-    height = 1024
-    guidance_scale = 3.0
-    randomize_seed_val = True
-
-    # 🎨 Generate the image
-    seed = randomize_seed(seed, randomize_seed_val)
+def get_pipeline(loader=load_pipeline):
+    # ♻️ Load the pipeline once and reuse it for every later call
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = loader()
+    return _pipeline
+
+def generation_settings():
+    # ⚙️ Everything besides prompt and seed that changes the rendered image
+    return {
+        "model": MODEL_ID,
+        "lora": LORA_ID,
+        "lora_scale": LORA_SCALE,
+        "negative_prompt": NEGATIVE_PROMPT,
+        "width": WIDTH,
+        "height": HEIGHT,
+        "guidance_scale": GUIDANCE_SCALE,
+        "num_inference_steps": NUM_INFERENCE_STEPS,
+    }
+
+def request_key(prompt, seed, settings):
+    payload = json.dumps({"prompt": prompt, "seed": seed, **settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def prompt_seed(prompt):
+    # 🔁 Stable seed derived from the prompt text, so reruns and repeats hit the manifest
+    return int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:4], "little")
+
+class Manifest:
+    # 📒 Append-only JSONL of finished requests; entries whose image is gone are ignored
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # ✂️ Line cut short by a crash
+                    if os.path.exists(entry["path"]):
+                        self.entries[entry["key"]] = entry
+        self.file = open(path, "a")
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, key, prompt, seed, path, settings):
+        entry = {"key": key, "prompt": prompt, "seed": seed, "path": path, "settings": settings}
+        self.entries[key] = entry
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def generate_batch(pipe, prompts, output_dir, seeds=None):
+    # 🖌️ Generate one image per prompt in a single pipeline call. Each prompt gets its own
+    # seeded generator, so a (prompt, seed) pair renders the same image in any batch.
+    if seeds is None:
+        seeds = [randomize_seed(0, True) for _ in prompts]
+    device = getattr(pipe, "device", "cpu")
+    generators = [torch.Generator(device=device).manual_seed(seed) for seed in seeds]
+
+    # 🎨 Generate the images
     images = pipe(
-        prompt=prompt,
-        negative_prompt=negative_prompt,
-        width=width,
-        height=height,
-        guidance_scale=guidance_scale,
-        num_inference_steps=25,
+        prompt=list(prompts),
+        negative_prompt=[NEGATIVE_PROMPT] * len(prompts),
+        width=WIDTH,
+        height=HEIGHT,
+        guidance_scale=GUIDANCE_SCALE,
+        num_inference_steps=NUM_INFERENCE_STEPS,
         num_images_per_prompt=1,
-        cross_attention_kwargs={"scale": 0.65},
+        generator=generators,
+        cross_attention_kwargs={"scale": LORA_SCALE},
         output_type="pil",
     ).images
 
-    # 💾 Save the generated image
-    image_path = save_image(images[0], output_dir)
-    print(f"Image generated and saved: {image_path}")
+    # 💾 Save the generated images
+    results = []
+    for prompt, seed, img in zip(prompts, seeds, images):
+        image_path = save_image(img, output_dir)
+        print(f"Image generated and saved: {image_path} (seed {seed})")
+        results.append((prompt, seed, image_path))
+    return results
+
+def generate_image(pipe, prompt, output_dir, seed=None):
+    # 🖌️ Generate image for the prompt
+    return generate_batch(pipe, [prompt], output_dir, None if seed is None else [seed])[0]
+
+def generate_images(pipe, prompts, output_dir, batch_size=BATCH_SIZE, base_seed=None, manifest=None):
+    # 📦 Group prompts (any iterable) into batches and report throughput.
+    # With base_seed, prompt i always uses seed base_seed + i, whatever the batch size.
+    # With a manifest, requests already rendered (in an earlier run or earlier in this
+    # one) are served from disk, and prompts without base_seed get a seed from their text.
+    if manifest is None:
+        prompts = iter(prompts)
+        results = []
+        start = time.perf_counter()
+        while True:
+            batch = list(islice(prompts, batch_size))
+            if not batch:
+                break
+            seeds = None if base_seed is None else [base_seed + len(results) + i for i in range(len(batch))]
+            results.extend(generate_batch(pipe, batch, output_dir, seeds))
+        report_throughput(len(results), time.perf_counter() - start)
+        return results
+
+    settings = generation_settings()
+    results = []
+    pending = {}  # 🧾 key -> (prompt, seed) waiting for the next pipeline call
+    rendered = 0
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal rendered
+        keys = list(pending)
+        batch = generate_batch(pipe, [pending[key][0] for key in keys], output_dir, [pending[key][1] for key in keys])
+        for key, (prompt, seed, path) in zip(keys, batch):
+            manifest.add(key, prompt, seed, path, settings)
+        rendered += len(batch)
+        pending.clear()
 
-def generate_images_from_file(prompt_file, output_dir):
-    # 📖 Read prompts from file
+    order = []
+    for index, prompt in enumerate(prompts):
+        seed = prompt_seed(prompt) if base_seed is None else base_seed + index
+        key = request_key(prompt, seed, settings)
+        order.append(key)
+        if manifest.get(key) is None and key not in pending:
+            pending[key] = (prompt, seed)
+            if len(pending) == batch_size:
+                flush()
+    if pending:
+        flush()
+    for key in order:
+        entry = manifest.get(key)
+        results.append((entry["prompt"], entry["seed"], entry["path"]))
+    print(f"{len(results)} requests: {rendered} rendered, {len(results) - rendered} served from disk")
+    report_throughput(rendered, time.perf_counter() - start)
+    return results
+
+def report_throughput(count, elapsed):
+    if count:
+        print(f"Generated {count} images in {elapsed:.1f}s ({count / elapsed:.2f} images/sec)")
+
+def iter_prompts(prompt_file):
+    # 📖 Stream prompts one line at a time, skipping blank lines
     with open(prompt_file, "r") as file:
-        prompts = file.readlines()
+        for line in file:
+            prompt = line.strip()
+            if prompt:
+                yield prompt
 
-    # 🚀 Load the pipeline
-    pipe = load_pipeline()
+def open_manifest(output_dir, use_manifest=True):
+    return Manifest(os.path.join(output_dir, MANIFEST_NAME)) if use_manifest else None
 
-    # 🖌️ Generate images for each prompt
-    for prompt in prompts:
-        prompt = prompt.strip()
-        generate_image(pipe, prompt, output_dir)
+def generate_images_from_file(prompt_file, output_dir, pipe=None, batch_size=BATCH_SIZE, base_seed=None, use_manifest=True):
+    # 🚀 Reuse the loaded pipeline
+    pipe = pipe if pipe is not None else get_pipeline()
 
-def generate_images_from_code(prompts, output_dir):
-    # 🚀 Load the pipeline
-    pipe = load_pipeline()
+    # 🖌️ Generate images for each prompt, reading the file as we go
+    manifest = open_manifest(output_dir, use_manifest)
+    try:
+        return generate_images(pipe, iter_prompts(prompt_file), output_dir, batch_size, base_seed, manifest)
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+def generate_images_from_code(prompts, output_dir, pipe=None, batch_size=BATCH_SIZE, base_seed=None, use_manifest=True):
+    # 🚀 Reuse the loaded pipeline
+    pipe = pipe if pipe is not None else get_pipeline()
 
     # 🖌️ Generate images for each prompt
-    for prompt in prompts:
-        generate_image(pipe, prompt, output_dir)
+    manifest = open_manifest(output_dir, use_manifest)
+    try:
+        return generate_images(pipe, prompts, output_dir, batch_size, base_seed, manifest)
+    finally:
+        if manifest is not None:
+            manifest.close()
 
 # 🏁 Run the script
 if __name__ == "__main__":
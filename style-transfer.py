@@ -11,10 +11,9 @@ import gradio as gr
 from huggingface_hub import hf_hub_download, snapshot_download
 from ip_adapter import IPAdapterXL
 import os
-
-snapshot_download(
-    repo_id="h94/IP-Adapter", allow_patterns="sdxl_models/*", local_dir="."
-)
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # global variable
 MAX_SEED = np.iinfo(np.int32).max
@@ -27,33 +26,94 @@ image_encoder_path = "sdxl_models/image_encoder"
 ip_ckpt = "sdxl_models/ip-adapter_sdxl.bin"
 
 controlnet_path = "diffusers/controlnet-canny-sdxl-1.0"
-controlnet = ControlNetModel.from_pretrained(
-    controlnet_path, use_safetensors=False, torch_dtype=torch.float16
-).to(device)
-
-# load Hyper SD
-
-pipe = StableDiffusionXLControlNetPipeline.from_pretrained(
-    base_model_path,
-    controlnet=controlnet,
-    torch_dtype=torch.float16,
-    variant="fp16",
-    add_watermarker=False,
-).to(device)
-pipe.set_progress_bar_config(disable=True)
-pipe.scheduler = TCDScheduler.from_config(pipe.scheduler.config)
-pipe.load_lora_weights(
-    hf_hub_download("ByteDance/Hyper-SD", "Hyper-SDXL-1step-lora.safetensors")
-)
 eta = 1.0
 
-ip_model = IPAdapterXL(
-    pipe,
-    image_encoder_path,
-    ip_ckpt,
-    device,
-    target_blocks=["up_blocks.0.attentions.1"],
-)
+# attention blocks patched by each IP-Adapter mode
+TARGET_BLOCKS = {
+    "Load original IP-Adapter": ["blocks"],
+    "Load only style blocks": ["up_blocks.0.attentions.1"],
+    "Load style+layout block": ["up_blocks.0.attentions.1", "down_blocks.2.attentions.1"],
+}
+
+_pipe = None
+# target blocks -> (IPAdapterXL, unet attention processors it installed)
+_ip_adapters = {}
+_active_blocks = None
+
+
+def load_pipeline():
+    snapshot_download(
+        repo_id="h94/IP-Adapter", allow_patterns="sdxl_models/*", local_dir="."
+    )
+    controlnet = ControlNetModel.from_pretrained(
+        controlnet_path, use_safetensors=False, torch_dtype=torch.float16
+    ).to(device)
+
+    # load Hyper SD
+
+    pipe = StableDiffusionXLControlNetPipeline.from_pretrained(
+        base_model_path,
+        controlnet=controlnet,
+        torch_dtype=torch.float16,
+        variant="fp16",
+        add_watermarker=False,
+    ).to(device)
+    pipe.set_progress_bar_config(disable=True)
+    pipe.scheduler = TCDScheduler.from_config(pipe.scheduler.config)
+    pipe.load_lora_weights(
+        hf_hub_download("ByteDance/Hyper-SD", "Hyper-SDXL-1step-lora.safetensors")
+    )
+    return pipe
+
+
+def get_pipeline(loader=load_pipeline):
+    global _pipe
+    if _pipe is None:
+        _pipe = loader()
+    return _pipe
+
+
+def get_ip_adapter(target="Load only style blocks", pipe=None, adapter_class=None):
+    # One IPAdapterXL per target block set: the checkpoint is loaded once, and switching
+    # modes only reinstalls the attention processors that adapter patched into the UNet.
+    global _active_blocks
+    pipe = pipe if pipe is not None else get_pipeline()
+    blocks = tuple(TARGET_BLOCKS[target])
+    if blocks not in _ip_adapters:
+        adapter = (adapter_class or IPAdapterXL)(
+            pipe, image_encoder_path, ip_ckpt, device, target_blocks=list(blocks)
+        )
+        _ip_adapters[blocks] = (adapter, dict(pipe.unet.attn_processors))
+    elif _active_blocks != blocks:
+        pipe.unet.set_attn_processor(dict(_ip_adapters[blocks][1]))
+    _active_blocks = blocks
+    return _ip_adapters[blocks][0]
+
+
+def cache_style_embedding(ip_model, style_image):
+    # Encode the style image through the CLIP image encoder once; later generate() calls
+    # with the same PIL object reuse the embedding instead of re-running the encoder.
+    clip_image = ip_model.clip_image_processor(images=style_image, return_tensors="pt").pixel_values
+    with torch.inference_mode():
+        clip_image_embeds = ip_model.image_encoder(
+            clip_image.to(ip_model.device, dtype=torch.float16)
+        ).image_embeds
+    encode = type(ip_model).get_image_embeds
+    cached = clip_image_embeds
+
+    def get_image_embeds(pil_image=None, clip_image_embeds=None, content_prompt_embeds=None):
+        if pil_image is style_image:
+            pil_image, clip_image_embeds = None, cached
+        elif isinstance(pil_image, list) and pil_image and all(image is style_image for image in pil_image):
+            pil_image, clip_image_embeds = None, cached.repeat(len(pil_image), 1)
+        return encode(ip_model, pil_image, clip_image_embeds, content_prompt_embeds)
+
+    ip_model.get_image_embeds = get_image_embeds
+    return clip_image_embeds
+
+
+def clear_style_embedding(ip_model):
+    ip_model.__dict__.pop("get_image_embeds", None)
 
 
 def resize_img(
@@ -104,41 +164,9 @@ def create_image(
     neg_content_scale=0,
 ):
     seed = random.randint(0, MAX_SEED) if seed == -1 else seed
-    if target == "Load original IP-Adapter":
-
-        ip_model = IPAdapterXL(
-            pipe, image_encoder_path, ip_ckpt, device, target_blocks=["blocks"]
-        )
-    elif target == "Load only style blocks":
-
-        ip_model = IPAdapterXL(
-            pipe,
-            image_encoder_path,
-            ip_ckpt,
-            device,
-            target_blocks=["up_blocks.0.attentions.1"],
-        )
-    elif target == "Load style+layout block":
-
-        ip_model = IPAdapterXL(
-            pipe,
-            image_encoder_path,
-            ip_ckpt,
-            device,
-            target_blocks=["up_blocks.0.attentions.1", "down_blocks.2.attentions.1"],
-        )
+    ip_model = get_ip_adapter(target)
 
-    if input_image is not None:
-        input_image = resize_img(input_image, max_side=1024)
-        cv_input_image = pil_to_cv2(input_image)
-        detected_map = cv2.Canny(cv_input_image, 50, 200)
-        canny_map = Image.fromarray(cv2.cvtColor(detected_map, cv2.COLOR_BGR2RGB))
-    else:
-        canny_map = Image.new("RGB", (1024, 1024), color=(255, 255, 255))
-        control_scale = 0
-
-    if float(control_scale) == 0:
-        canny_map = canny_map.resize((1024, 1024))
+    canny_map, control_scale = control_map(input_image, control_scale)
 
     if len(neg_content_prompt) > 0 and neg_content_scale != 0:
         images = ip_model.generate(
@@ -174,6 +202,21 @@ def create_image(
     return image
 
 
+def control_map(input_image, control_scale):
+    if input_image is not None:
+        input_image = resize_img(input_image, max_side=1024)
+        cv_input_image = pil_to_cv2(input_image)
+        detected_map = cv2.Canny(cv_input_image, 50, 200)
+        canny_map = Image.fromarray(cv2.cvtColor(detected_map, cv2.COLOR_BGR2RGB))
+    else:
+        canny_map = Image.new("RGB", (1024, 1024), color=(255, 255, 255))
+        control_scale = 0
+
+    if float(control_scale) == 0:
+        canny_map = canny_map.resize((1024, 1024))
+    return canny_map, control_scale
+
+
 def pil_to_cv2(image_pil):
     image_np = np.array(image_pil)
     image_cv2 = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
@@ -185,32 +228,118 @@ INPUT_FOLDER = "/content/drive/MyDrive/no-bg-images"
 STYLE_IMAGE = "/content/drive/MyDrive/no-bg-images/illustra.png"
 OUTPUT_FOLDER = "/content/drive/MyDrive/out"
 
-def process_images(input_folder, style_image, output_folder):
+# folder run settings
+N_PROMPT = "text, watermark, lowres, low quality, worst quality, deformed, glitch, low contrast, noisy, saturation, blurry"
+CONTROL_SCALE = 0.8
+BATCH_SIZE = 4  # same-size control maps per generate call; lower it if the GPU runs out of memory
+PREPROCESS_WORKERS = 4
+PREFETCH_IMAGES = 16
+
+def load_control_map(path, control_scale=CONTROL_SCALE):
+    # Runs on the worker pool: decode, resize and Canny one input ahead of generation.
+    start = time.perf_counter()
+    input_image_pil = Image.open(path)
+    canny_map, _ = control_map(input_image_pil, control_scale)
+    return canny_map, time.perf_counter() - start
+
+
+def iter_control_maps(paths, workers=PREPROCESS_WORKERS, prefetch=PREFETCH_IMAGES):
+    # Yields (path, canny_map, seconds) in input order, keeping `prefetch` inputs in flight.
+    with ThreadPoolExecutor(workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.submit(load_control_map, path)))
+            if len(pending) > prefetch:
+                path, future = pending.popleft()
+                yield (path, *future.result())
+        while pending:
+            path, future = pending.popleft()
+            yield (path, *future.result())
+
+
+@spaces.GPU(enable_queue=True)
+def style_batch(ip_model, style_image_pil, canny_maps, control_scale=CONTROL_SCALE, seed=-1):
+    # One generate call for several same-size control maps, all styled by the same image.
+    seed = random.randint(0, MAX_SEED) if seed == -1 else seed
+    return ip_model.generate(
+        pil_image=[style_image_pil] * len(canny_maps),
+        prompt="",
+        negative_prompt=N_PROMPT,
+        scale=1.0,
+        guidance_scale=0.0,
+        num_samples=1,
+        num_inference_steps=5,
+        seed=seed,
+        image=canny_maps,
+        controlnet_conditioning_scale=float(control_scale),
+        eta=1.0,
+    )
+
+
+def process_images(
+    input_folder,
+    style_image,
+    output_folder,
+    target="Load only style blocks",
+    batch_size=BATCH_SIZE,
+    workers=PREPROCESS_WORKERS,
+):
     style_image_pil = Image.open(style_image)
+    ip_model = get_ip_adapter(target)
+    cache_style_embedding(ip_model, style_image_pil)
+    try:
+        return _process_folder(input_folder, style_image_pil, output_folder, ip_model, batch_size, workers)
+    finally:
+        clear_style_embedding(ip_model)
+
+
+def _process_folder(input_folder, style_image_pil, output_folder, ip_model, batch_size, workers):
+    # Three overlapping stages: a thread pool prepares control maps, this thread generates
+    # batches of same-size maps, and a writer thread encodes and saves the results.
+    paths = [
+        os.path.join(input_folder, filename)
+        for filename in sorted(os.listdir(input_folder))
+        if filename.endswith(".jpg") or filename.endswith(".png")
+    ]
+    timings = {"preprocess": 0.0, "generate": 0.0, "save": 0.0}
+    groups = {}  # control map size -> [(path, canny_map)] waiting for a full batch
+    saved = []
+
+    def save(path, image):
+        start = time.perf_counter()
+        output_filename = os.path.splitext(os.path.basename(path))[0] + "_generated.jpg"
+        image.save(os.path.join(output_folder, output_filename))
+        timings["save"] += time.perf_counter() - start
+
+    def run(batch):
+        start = time.perf_counter()
+        images = style_batch(ip_model, style_image_pil, [canny_map for _, canny_map in batch])
+        timings["generate"] += time.perf_counter() - start
+        for (path, _), image in zip(batch, images):
+            saved.append(writer.submit(save, path, image))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(1) as writer:
+        for path, canny_map, seconds in iter_control_maps(paths, workers):
+            timings["preprocess"] += seconds
+            group = groups.setdefault(canny_map.size, [])
+            group.append((path, canny_map))
+            if len(group) == batch_size:
+                run(groups.pop(canny_map.size))
+        for batch in groups.values():
+            run(batch)
+    for future in saved:
+        future.result()
+    elapsed = time.perf_counter() - start
+
+    count = len(saved)
+    print(
+        f"Styled {count} images in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.2f} images/sec); "
+        f"preprocess {timings['preprocess']:.1f}s over {workers} workers, "
+        f"generate {timings['generate']:.1f}s, save {timings['save']:.1f}s"
+    )
+    return count
 
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".jpg") or filename.endswith(".png"):
-            input_image_path = os.path.join(input_folder, filename)
-            input_image_pil = Image.open(input_image_path)
-
-            generated_image = create_image(
-                image_pil=style_image_pil,
-                input_image=input_image_pil,
-                prompt="",
-                n_prompt="text, watermark, lowres, low quality, worst quality, deformed, glitch, low contrast, noisy, saturation, blurry",
-                scale=1.0,
-                control_scale=0.8,
-                guidance_scale=0.0,
-                num_inference_steps=5,
-                seed=-1,
-                target="Load only style blocks",
-                neg_content_prompt="bad eyes",
-                neg_content_scale=0,
-            )
-
-            output_filename = os.path.splitext(filename)[0] + "_generated.jpg"
-            output_path = os.path.join(output_folder, output_filename)
-            generated_image.save(output_path)
 
 if __name__ == "__main__":
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
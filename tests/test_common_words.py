@@ -0,0 +1,20 @@
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common_words import TOKEN_PATTERN, corpus_ranges, count_range
+
+TEXT = "The cat's hat\n\tand THE  dog don't café naïve\nthe end "
+
+@pytest.mark.parametrize('block_size', [1, 2, 3, 5, 8, 1 << 20])
+@pytest.mark.parametrize('chunk_size', [4, 16, 1 << 20])
+def test_count_range_blocks(tmp_path, block_size, chunk_size):
+    path = tmp_path / 'corpus.txt'
+    path.write_text(TEXT * 3, encoding='utf-8')
+    counts = Counter()
+    for task in corpus_ranges(path, chunk_size):
+        counts.update(count_range(task, block_size))
+    assert counts == Counter(TOKEN_PATTERN.findall((TEXT * 3).lower()))
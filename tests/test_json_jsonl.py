@@ -0,0 +1,49 @@
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from json_jsonl import CHUNK_SIZE, iter_json_array
+
+ARRAYS = [
+    '[1.5, 2]',
+    '[4e10, -0.25E-3, 12345678901234567890123]',
+    '[true, false, null, 0, -1]',
+    '[ "a" , {"b": [1.0e+2, null]} , [] ,3.14159]',
+    '[\n  1.5,\n  2\n]',
+    '[]',
+]
+
+@pytest.mark.parametrize('text', ARRAYS)
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7])
+def test_iter_json_array_small_chunks(text, chunk_size):
+    assert list(iter_json_array(io.StringIO(text), chunk_size)) == json.loads(text)
+
+def test_iter_json_array_number_cut_at_chunk_boundary():
+    for value in ['1.5', '4e10', '-2.5e-3']:
+        for cut in range(1, len(value)):
+            text = '[' + ' ' * (CHUNK_SIZE - 1 - cut) + value + ', 2]'
+            assert list(iter_json_array(io.StringIO(text))) == [json.loads(value), 2]
+
+def test_iter_json_array_malformed():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[1 2]'), 1))
+
+class CountingReader(io.StringIO):
+    chars_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.chars_read += len(chunk)
+        return chunk
+
+@pytest.mark.parametrize('element', ['{"a": 1 "b": 2}', '[1, 2,, 3]', '{"a": tru}', '"abc" "def"'])
+def test_iter_json_array_malformed_stops_reading(element):
+    # A bad element followed by a large tail raises without buffering the rest of the input
+    reader = CountingReader('[' + element + ', ' + '{"x": "yyyyyyyy"}, ' * 100000 + '1]')
+    with pytest.raises(ValueError):
+        list(iter_json_array(reader, 4096))
+    assert reader.chars_read <= 2 * 4096
@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import re
+import sys
+import time
+import numpy as np
+from row_store import RowStore
+
+MODEL_NAME = 'text-embedding-3-small'
+CACHE_FOLDER = '.embedding-cache'
+
+# Texts per API request (the embeddings endpoint accepts up to 2048 inputs)
+BATCH_SIZE = 512
+# Requests in flight at once; raise it until the rate limit, not the network, is the bottleneck
+MAX_CONCURRENCY = 8
+# Attempts per request, waiting a random 0..min(MAX_WAIT, MIN_WAIT * 2**attempt) seconds in between
+MAX_ATTEMPTS = 6
+MIN_WAIT = 1.0
+MAX_WAIT = 60.0
+# Rows per side of the similarity tiles compared at once in remove_duplicate_texts
+BLOCK_SIZE = 4096
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def clean_text(text):
+    # Newlines hurt embedding quality, so they are folded into spaces before hashing and sending
+    return text.replace("\n", " ")
+
+
+def openai_embedder(client=None, base_url=None):
+    # Async embed(texts, model) backed by the OpenAI API, or any server speaking its protocol
+    if client is None:
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(base_url=base_url)
+
+    async def embed(texts, model):
+        response = await client.embeddings.create(input=texts, model=model)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    return embed
+
+
+def hash_embedder(dim=64, delay=0.0):
+    # Deterministic stand-in: the same text always gets the same unit vector. Useful for
+    # tests and benchmarks; `delay` simulates request latency.
+    async def embed(texts, model):
+        if delay:
+            await asyncio.sleep(delay)
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(f"{model}\0{text}".encode('utf-8')).digest()[:8], 'little')
+            vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return vectors
+
+    return embed
+
+
+def is_retryable(error):
+    # Rate limits, timeouts and server errors are worth retrying; other 4xx responses are not
+    status = getattr(error, 'status_code', None)
+    return status is None or status in (408, 409, 429) or status >= 500
+
+
+async def with_backoff(call, *args, attempts=MAX_ATTEMPTS, min_wait=MIN_WAIT, max_wait=MAX_WAIT):
+    for attempt in range(attempts):
+        try:
+            return await call(*args)
+        except Exception as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            await asyncio.sleep(random.uniform(0, min(max_wait, min_wait * 2 ** attempt)))
+
+
+class EmbeddingCache(RowStore):
+    # Text embeddings cached as float32 rows in a RowStore (one folder per model), with an
+    # SQLite table mapping (model, sha256 of the text) to a row, so a line seen before is
+    # never sent again. The width is taken from the first batch the embedder returns.
+
+    def __init__(self, folder, model_name):
+        super().__init__(os.path.join(folder, re.sub(r'[^A-Za-z0-9._-]', '_', model_name)), 'embeddings.f32', np.float32)
+        self.model_name = model_name
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS texts (model TEXT, sha256 TEXT, row INTEGER, PRIMARY KEY (model, sha256))"
+        )
+        self.db.commit()
+
+    def lookup(self, hashes):
+        # Returns {hash: row} for the hashes already embedded with this model
+        found = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            query = "SELECT sha256, row FROM texts WHERE model = ? AND sha256 IN (%s)" % ','.join('?' * len(chunk))
+            found.update(self.db.execute(query, (self.model_name, *chunk)))
+        return found
+
+    def add(self, hashes, vectors):
+        start = self.append(np.asarray(vectors, dtype=np.float32))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO texts VALUES (?, ?, ?)",
+            ((self.model_name, h, start + offset) for offset, h in enumerate(hashes)),
+        )
+        self.db.commit()
+
+
+async def embed_missing(cache, missing, embed, model_name, batch_size=BATCH_SIZE, concurrency=MAX_CONCURRENCY):
+    # Embed {hash: text} in batches with at most `concurrency` requests in flight; each batch
+    # is written to the cache as soon as it arrives, so an interrupted run keeps its progress.
+    items = list(missing.items())
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+    start = time.perf_counter()
+
+    async def run(batch):
+        nonlocal done
+        async with semaphore:
+            vectors = await with_backoff(embed, [text for _, text in batch], model_name)
+        if len(vectors) != len(batch):
+            raise ValueError(f"Embedder returned {len(vectors)} vectors for {len(batch)} texts")
+        cache.add([h for h, _ in batch], vectors)
+        done += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"Embedded {done}/{len(items)} texts ({done / elapsed:.0f} texts/s)", end='\r', file=sys.stderr, flush=True)
+
+    await asyncio.gather(*(run(items[i:i + batch_size]) for i in range(0, len(items), batch_size)))
+    if items:
+        print(file=sys.stderr)
+
+
+def embed_texts(texts, output_path, embed=None, model_name=MODEL_NAME, cache_folder=CACHE_FOLDER,
+                batch_size=BATCH_SIZE, concurrency=MAX_CONCURRENCY):
+    # Embed every text (repeated and previously cached lines are sent once, ever) and
+    # write the vectors in input order to a float32 .npy file, returned as a read-only memmap.
+    embed = embed if embed is not None else openai_embedder()
+    hashes = [text_hash(clean_text(text)) for text in texts]
+    cache = EmbeddingCache(cache_folder, model_name)
+    try:
+        rows = cache.lookup(set(hashes))
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in rows:
+                missing.setdefault(h, clean_text(text))
+        asyncio.run(embed_missing(cache, missing, embed, model_name, batch_size, concurrency))
+        rows.update(cache.lookup(missing))
+        print(f"{len(texts)} texts: {len(missing)} embedded, {len(texts) - len(missing)} from cache or repeated")
+
+        dim = cache.dim or 0
+        out = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=(len(texts), dim))
+        for i in range(0, len(hashes), 65536):
+            chunk = hashes[i:i + 65536]
+            out[i:i + len(chunk)] = cache.matrix[np.fromiter((rows[h] for h in chunk), dtype=np.int64, count=len(chunk))]
+        out.flush()
+        del out
+    finally:
+        cache.close()
+    return np.load(output_path, mmap_mode='r')
+
+
+def remove_duplicate_texts(texts, embeddings, threshold=0.5, block_size=BLOCK_SIZE):
+    # Keep the earliest text in input order and drop every later text whose cosine similarity
+    # to any earlier one is above the threshold. Similarities are computed one
+    # (block_size x block_size) tile at a time, so memory stays bounded.
+    emb = np.asarray(embeddings, dtype=np.float32)
+    emb = emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+    dropped = np.zeros(len(emb), dtype=bool)
+    for i0 in range(0, len(emb), block_size):
+        for j0 in range(i0, len(emb), block_size):
+            tile = emb[i0:i0 + block_size] @ emb[j0:j0 + block_size].T
+            if i0 == j0:
+                tile = np.triu(tile > threshold, k=1)
+            else:
+                tile = tile > threshold
+            dropped[j0:j0 + tile.shape[1]] |= tile.any(axis=0)
+    unique = [text for text, drop in zip(texts, dropped) if not drop]
+    duplicates = [text for text, drop in zip(texts, dropped) if drop]
+    return unique, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed the lines of a text file into a float32 .npy matrix, with an on-disk cache.")
+    parser.add_argument("input_file", help="text file, one text per line")
+    parser.add_argument("output_file", help="where to write the (lines x dim) float32 .npy matrix")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--cache", default=CACHE_FOLDER, help="embedding cache folder")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="requests in flight")
+    parser.add_argument("--base-url", help="OpenAI-compatible server to use instead of api.openai.com")
+    parser.add_argument("--fake-dim", type=int, help="use a deterministic offline embedder of this dimension")
+    args = parser.parse_args()
+
+    with open(args.input_file, 'r', encoding='utf-8') as f:
+        texts = [line.rstrip('\n') for line in f]
+    embed = hash_embedder(args.fake_dim) if args.fake_dim else openai_embedder(base_url=args.base_url)
+    matrix = embed_texts(texts, args.output_file, embed, args.model, args.cache, args.batch_size, args.concurrency)
+    print(f"Wrote {matrix.shape[0]} x {matrix.shape[1]} embeddings to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()